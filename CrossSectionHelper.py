@@ -1,6 +1,7 @@
 from collections import namedtuple
 from collections.abc import Mapping
 import os
+import re
 
 
 def namedtuple_with_defaults(typename, field_names, default_values=()):
@@ -14,6 +15,294 @@ def namedtuple_with_defaults(typename, field_names, default_values=()):
     return T
 
 
+class SampleNameIndex():
+    """Search index over a set of sample names
+
+    Combines a prefix trie, used to narrow down glob searches to the names sharing the literal prefix of the pattern, with a
+    trigram index, used to find names similar to a misspelled one.
+
+    Args:
+        names (iterable of `str`): The sample names to index.
+
+    Example:
+        index = SampleNameIndex(["ZPrimeToTT_M400_W40", "ZPrimeToTT_M500_W50"])
+        index.search("ZPrimeToTT_M*_W40")
+        index.suggest("ZprimeToTT_M400_W40")
+    """
+
+    __terminal = ""
+
+    def __init__(self, names):
+        self.__trie = {}
+        self.__trigrams = {}
+        self.__names = set()
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.__names)
+
+    def __contains__(self, name):
+        return name in self.__names
+
+    @staticmethod
+    def trigrams(name):
+        padded = "$$" + name.lower() + "$"
+        return set(padded[i:i+3] for i in range(len(padded)-2))
+
+    def add(self, name):
+        if name in self.__names:
+            return
+        self.__names.add(name)
+        node = self.__trie
+        for char in name:
+            node = node.setdefault(char, {})
+        node[self.__terminal] = name
+        for trigram in self.trigrams(name):
+            self.__trigrams.setdefault(trigram, set()).add(name)
+
+    def with_prefix(self, prefix):
+        """Return all names starting with prefix, sorted alphabetically"""
+        node = self.__trie
+        for char in prefix:
+            if char not in node:
+                return []
+            node = node[char]
+        names = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for char, child in node.items():
+                if char == self.__terminal:
+                    names.append(child)
+                else:
+                    stack.append(child)
+        return sorted(names)
+
+    def search(self, pattern):
+        """Return all names matching the shell-style pattern (`*`, `?` and `[...]` are supported), sorted alphabetically"""
+        import fnmatch
+        wildcard = min([pattern.find(c) for c in "*?[" if c in pattern] or [len(pattern)])
+        candidates = self.with_prefix(pattern[:wildcard])
+        if wildcard == len(pattern):
+            return [name for name in candidates if name == pattern]
+        return [name for name in candidates if fnmatch.fnmatchcase(name, pattern)]
+
+    def suggest(self, name, max_suggestions=5, cutoff=0.4):
+        """Return up to max_suggestions indexed names most similar to name (trigram similarity of at least cutoff), best first"""
+        query = self.trigrams(name)
+        shared = {}
+        for trigram in query:
+            for candidate in self.__trigrams.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        scored = []
+        for candidate, n_shared in shared.items():
+            score = 2.0*n_shared/(len(query)+len(self.trigrams(candidate)))
+            if score >= cutoff:
+                scored.append((-score, candidate))
+        return [candidate for _, candidate in sorted(scored)[:max_suggestions]]
+
+
+class SampleValueStore():
+    """Column-wise storage of the values of the MCSampleValuesHelper
+
+    Numerical values are stored in one float64 column per (key, period) for which at least one sample has a value, indexed by
+    the sample id, with NaN marking unset values. Values equal to the default of their field (the unset fields of the
+    namedtuples) are not stored, so the columns grow with the data actually present and not with the number of keys and
+    periods. A parallel int8 column flags values given as integers (so that e.g. event counts are returned as int) and is only
+    created for columns holding such values. The up and down uncertainties (the Up/Down fields) are stored in further columns
+    of the same kind, and strings (the Source fields and the XML paths) in one {sample id: string} table per (key, period)
+    holding only the values which are set. Entries which are not value tuples (e.g. the SampleInfo) are kept as they are.
+
+    The store is the only copy of the values: the namedtuples of a sample are rebuilt from it on request (see values).
+
+    Args:
+        keys (:obj:`list` of `tuple`): (key, field prefix, default value) of every tuple type, e.g. ("NEvents", "NEVT", -1.0)
+        periods (:obj:`list` of `str`): The energies and years used as field suffixes
+
+    Example:
+        store = SampleValueStore([("NEvents", "NEVT", -1.0)], ["13TeV", "UL18"])
+        store.add("WW", {"NEvents": NEventsValues(NEVT_UL18=15679000)})
+        store.get("WW", "NEvents", "", "13TeV", "UL18", -1.0)
+    """
+
+    uncertainty_infos = ["Up", "Down"]
+
+    def __init__(self, keys, periods):
+        self.keys = list(keys)
+        self.periods = list(periods)
+        self.key_ids = {key: i for i, (key, _, _) in enumerate(self.keys)}
+        self.period_ids = {period: i for i, period in enumerate(self.periods)}
+        self.sample_ids = {}
+        self.names = []
+        # (key id, period id, info) -> column over the sample ids, info is "" for the values and "Up"/"Down" for the uncertainties
+        self.columns = {}
+        self.integer_columns = {}
+        # (key id, period id, info) -> {sample id: string}, info is "" for the values and "Source" for the sources
+        self.string_columns = {}
+        # One flag per key and sample: whether the sample has a tuple of this key
+        self.present = [bytearray() for _ in self.keys]
+        self.extras = {}
+        self.__nan = float("nan")
+
+    def __len__(self):
+        return len(self.names)
+
+    def nbytes(self):
+        """Return the memory used by the numerical columns and the presence flags in bytes"""
+        return (sum(len(column)*column.itemsize for column in list(self.columns.values())+list(self.integer_columns.values()))
+                + sum(len(flags) for flags in self.present))
+
+    def __column(self, columns, column_id, typecode, initial):
+        from array import array
+        column = columns.get(column_id)
+        if column is None:
+            column = columns[column_id] = array(typecode, [initial])*len(self.names)
+        return column
+
+    def add(self, name, values):
+        """Store (or replace) all value tuples of a sample, given as {key: namedtuple}"""
+        if name in self.sample_ids:
+            sample_id = self.sample_ids[name]
+            for column in self.columns.values():
+                column[sample_id] = self.__nan
+            for column in self.integer_columns.values():
+                column[sample_id] = 0
+            for column in self.string_columns.values():
+                column.pop(sample_id, None)
+            for flags in self.present:
+                flags[sample_id] = 0
+            self.extras.pop(sample_id, None)
+        else:
+            sample_id = len(self.names)
+            self.sample_ids[name] = sample_id
+            self.names.append(name)
+            for column in self.columns.values():
+                column.append(self.__nan)
+            for column in self.integer_columns.values():
+                column.append(0)
+            for flags in self.present:
+                flags.append(0)
+        for key, value_tuple in values.items():
+            if not key in self.key_ids:
+                self.extras.setdefault(sample_id, {})[key] = value_tuple
+                continue
+            key_id = self.key_ids[key]
+            _, prefix, default = self.keys[key_id]
+            self.present[key_id][sample_id] = 1
+            for field, value in zip(value_tuple._fields, value_tuple):
+                field_prefix, _, period = field.rpartition("_")
+                if not period in self.period_ids or not field_prefix.startswith(prefix):
+                    continue
+                period_id = self.period_ids[period]
+                info = field_prefix[len(prefix):]
+                if isinstance(value, str):
+                    if value != "":
+                        self.string_columns.setdefault((key_id, period_id, info), {})[sample_id] = value
+                elif info == "" and value != default:
+                    self.__column(self.columns, (key_id, period_id, ""), "d", self.__nan)[sample_id] = value
+                    if isinstance(value, int):
+                        self.__column(self.integer_columns, (key_id, period_id), "b", 0)[sample_id] = 1
+                elif info in self.uncertainty_infos and value != 0.0:
+                    self.__column(self.columns, (key_id, period_id, info), "d", self.__nan)[sample_id] = value
+
+    def values(self, name, value_types):
+        """Rebuild the entries of a sample as {key: namedtuple}, value_types gives the namedtuple type of every key"""
+        sample_id = self.sample_ids[name]
+        fields = {key_id: {} for key_id, flags in enumerate(self.present) if flags[sample_id]}
+        for (key_id, period_id, info), column in self.columns.items():
+            value = column[sample_id]
+            if value == value and key_id in fields:
+                integers = self.integer_columns.get((key_id, period_id)) if info == "" else None
+                fields[key_id][self.keys[key_id][1]+info+"_"+self.periods[period_id]] = int(value) if integers is not None and integers[sample_id] else value
+        for (key_id, period_id, info), column in self.string_columns.items():
+            if sample_id in column and key_id in fields:
+                fields[key_id][self.keys[key_id][1]+info+"_"+self.periods[period_id]] = column[sample_id]
+        values = {self.keys[key_id][0]: value_types[self.keys[key_id][0]](**key_fields) for key_id, key_fields in fields.items()}
+        values.update(self.extras.get(sample_id, {}))
+        return values
+
+    def has_key(self, name, key):
+        return self.present[self.key_ids[key]][self.sample_ids[name]] == 1
+
+    def __lookup(self, sample_id, key_id, info, period_id):
+        if info == "" or info in self.uncertainty_infos:
+            column = self.columns.get((key_id, period_id, info))
+            value = self.__nan if column is None else column[sample_id]
+            if value == value:
+                integers = self.integer_columns.get((key_id, period_id)) if info == "" else None
+                return int(value) if integers is not None and integers[sample_id] else value
+            if info != "":
+                return None
+        return self.string_columns.get((key_id, period_id, info), {}).get(sample_id)
+
+    def get(self, name, key, info, energy, year, default, missing=None):
+        """Return the value for the energy if set (and not equal to default), otherwise the value for the year, otherwise default
+
+        If missing is given it is returned instead of default when no value is stored, to tell apart unset values.
+        """
+        sample_id = self.sample_ids[name]
+        key_id = self.key_ids[key]
+        if energy in self.period_ids:
+            value = self.__lookup(sample_id, key_id, info, self.period_ids[energy])
+            if value is not None and value != default:
+                return value
+        if year in self.period_ids:
+            value = self.__lookup(sample_id, key_id, info, self.period_ids[year])
+            if value is not None:
+                return value
+        return default if missing is None else missing
+
+    def column(self, key, energy, year, default, names=None, info=""):
+        """Return the numerical values (info="Up"/"Down": the uncertainties) of a key for many samples at once, as an array (see get for the energy/year precedence)"""
+        from array import array
+        key_id = self.key_ids[key]
+        sample_ids = range(len(self.names)) if names is None else [self.sample_ids[name] for name in names]
+        values = array("d", [default])*len(sample_ids)
+        for period in [year, energy]:
+            column = self.columns.get((key_id, self.period_ids.get(period), info))
+            if column is None:
+                continue
+            for i, sample_id in enumerate(sample_ids):
+                value = column[sample_id]
+                if value == value and (period == year or value != default):
+                    values[i] = value
+        return values
+
+
+class StoredValues(Mapping):
+    """The values of a SampleValueStore seen as the {name: {key: namedtuple}} dict they were built from
+
+    The namedtuples are rebuilt on every access, so that the values are held only once (in the store). Assigning an entry
+    adds it to the store.
+
+    Args:
+        store (:obj:`SampleValueStore`): The store holding the values
+        value_types (:obj:`dict`): The namedtuple type of every key of the store, e.g. {"NEvents": NEventsValues, ...}
+    """
+
+    def __init__(self, store, value_types):
+        self.store = store
+        self.value_types = value_types
+
+    def __getitem__(self, name):
+        if not name in self.store.sample_ids:
+            raise KeyError(name)
+        return self.store.values(name, self.value_types)
+
+    def __setitem__(self, name, values):
+        self.store.add(name, values)
+
+    def __contains__(self, name):
+        return name in self.store.sample_ids
+
+    def __iter__(self):
+        return iter(list(self.store.names))
+
+    def __len__(self):
+        return len(self.store.names)
+
+
 class MCSampleValuesHelper():
     """Stores the cross sections and k-factors associated to a given physics process.
 
@@ -31,16 +320,28 @@ class MCSampleValuesHelper():
         helper.get_nevt("TTbarTo2L2Nu","13TeV","2018")
         helper.get_br("TTbarTo2L2Nu","13TeV","2018")
         helper.get_xml("TTbar","13TeV","2016")
+        helper.lumi_cache_info()
+        helper.search("ZPrimeToTT_M*_W*0")
+        helper.get_data_samples("13TeV","UL17",era="C")
+        helper.get_data_lumi("UL17",["B","C"])
+        helper.get_values_array("CrossSection","13TeV","UL18")
+        helper.get_weights("UL17",helper.get_data_lumi("UL17"),kFactor=True)
+        helper.get_weight_variations("UL17",[{"CrossSection":+1},{"CrossSection":-1}],helper.get_data_lumi("UL17"))
+        helper.get_nevt("QCD_Pt_300to470","13p6TeV","2022")
     """
 
     __years = ["UL16preVFP","UL16postVFP","UL17","UL18"]
     __energies = ["13TeV"]
+    __year_energies = {"UL16preVFP": "13TeV", "UL16postVFP": "13TeV", "UL17": "13TeV", "UL18": "13TeV"}
     __xs_field_names = []
     __nevt_field_names = []
     __br_field_names = []
     __kfactor_field_names = []
     __corr_field_names = []
     __xml_field_names = []
+    # The cross sections, branching ratios and k-factors can have absolute up and down uncertainties (non-negative, in the unit of
+    # the value), e.g. XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63). Unset uncertainties are 0.
+    __uncertainty_keys = ["CrossSection", "BranchingRatio", "kFactor"]
     __key_field_map = {
         "CrossSection"   : ("XSec",-1.0),
         "NEvents"        : ("NEVT",-1.0),
@@ -57,12 +358,76 @@ class MCSampleValuesHelper():
             __kfactor_field_names.append("kFac"+mode+"_"+__val)
             __corr_field_names.append("Corr"+mode+"_"+__val)
             __xml_field_names.append("Xml"+mode+"_"+__val)
-    XSValues      = namedtuple_with_defaults("XSValues",      __xs_field_names,       [__key_field_map["CrossSection"][1],""]*len(__years+__energies))
+        for mode in ["Up", "Down"]:
+            __xs_field_names.append("XSec"+mode+"_"+__val)
+            __br_field_names.append("BRat"+mode+"_"+__val)
+            __kfactor_field_names.append("kFac"+mode+"_"+__val)
+    XSValues      = namedtuple_with_defaults("XSValues",      __xs_field_names,       [__key_field_map["CrossSection"][1],"",0.0,0.0]*len(__years+__energies))
     NEventsValues = namedtuple_with_defaults("NEventsValues", __nevt_field_names,     [__key_field_map["NEvents"][1],""]*len(__years+__energies))
-    BRValues      = namedtuple_with_defaults("BRValues",      __br_field_names,       [__key_field_map["BranchingRatio"][1],""]*len(__years+__energies))
-    kFactorValues = namedtuple_with_defaults("kFactorValues", __kfactor_field_names,  [__key_field_map["kFactor"][1],""]*len(__years+__energies))
+    BRValues      = namedtuple_with_defaults("BRValues",      __br_field_names,       [__key_field_map["BranchingRatio"][1],"",0.0,0.0]*len(__years+__energies))
+    kFactorValues = namedtuple_with_defaults("kFactorValues", __kfactor_field_names,  [__key_field_map["kFactor"][1],"",0.0,0.0]*len(__years+__energies))
     CorrValues    = namedtuple_with_defaults("CorrValues",    __corr_field_names,     [__key_field_map["Correction"][1],""]*len(__years+__energies))
     XMLValues     = namedtuple_with_defaults("XMLValues",     __xml_field_names,      [__key_field_map["XMLname"][1],""]*len(__years+__energies))
+    __value_type_names = {
+        "CrossSection"   : "XSValues",
+        "NEvents"        : "NEventsValues",
+        "BranchingRatio" : "BRValues",
+        "kFactor"        : "kFactorValues",
+        "Correction"     : "CorrValues",
+        "XMLname"        : "XMLValues",
+    }
+    # Optional per-sample metadata, derived from the XmlSource fields and the process name if not given (see get_sample_info)
+    SampleInfo    = namedtuple_with_defaults("SampleInfo",    ["isData", "era"],      [None, ""])
+
+    # Integrated luminosity in pb^-1 of the golden JSON per data-taking period and run era, with the first and last run of the era.
+    # UL16: per-era values of the PdmV UL2016 analysis page; era F is split at run 278769 into its HIPM (preVFP) and non-HIPM
+    # (postVFP) parts, derived from the preVFP/postVFP totals of 19.52/16.81 fb^-1 of the LumiRecommendationsRun2 TWiki.
+    # UL17, UL18: per-era values of the PdmV UL2017/UL2018 analysis pages (brilcalc with the physics normtag). The UL18 eras add
+    # up to 59.73 fb^-1, 0.2% below the quoted total of 59.83 fb^-1.
+    EraLumiValues = namedtuple_with_defaults("EraLumiValues", ["Lumi", "LumiSource", "firstRun", "lastRun"], [-1.0, "", -1, -1])
+    __era_lumi_dict = {
+        "UL16preVFP" : {
+            "B" : EraLumiValues(Lumi=5829.0,  LumiSource="PdmV UL2016 (ver2)",       firstRun=272007, lastRun=275376),
+            "C" : EraLumiValues(Lumi=2602.0,  LumiSource="PdmV UL2016",              firstRun=275657, lastRun=276283),
+            "D" : EraLumiValues(Lumi=4286.0,  LumiSource="PdmV UL2016",              firstRun=276315, lastRun=276811),
+            "E" : EraLumiValues(Lumi=4066.0,  LumiSource="PdmV UL2016",              firstRun=276831, lastRun=277420),
+            "F" : EraLumiValues(Lumi=2737.0,  LumiSource="19.52 fb^-1 minus B-E (HIPM part of F)", firstRun=277772, lastRun=278768),
+        },
+        "UL16postVFP" : {
+            "F" : EraLumiValues(Lumi=418.0,   LumiSource="16.81 fb^-1 minus G-H (non-HIPM part of F)", firstRun=278769, lastRun=278808),
+            "G" : EraLumiValues(Lumi=7652.0,  LumiSource="PdmV UL2016",              firstRun=278820, lastRun=280385),
+            "H" : EraLumiValues(Lumi=8740.0,  LumiSource="PdmV UL2016",              firstRun=280919, lastRun=284044),
+        },
+        "UL17" : {
+            "B" : EraLumiValues(Lumi=4803.0,  LumiSource="PdmV UL2017",              firstRun=297020, lastRun=299329),
+            "C" : EraLumiValues(Lumi=9574.0,  LumiSource="PdmV UL2017",              firstRun=299337, lastRun=302029),
+            "D" : EraLumiValues(Lumi=4248.0,  LumiSource="PdmV UL2017",              firstRun=302030, lastRun=303434),
+            "E" : EraLumiValues(Lumi=9315.0,  LumiSource="PdmV UL2017",              firstRun=303435, lastRun=304826),
+            "F" : EraLumiValues(Lumi=13540.0, LumiSource="PdmV UL2017",              firstRun=304911, lastRun=306462),
+        },
+        "UL18" : {
+            "A" : EraLumiValues(Lumi=14030.0, LumiSource="PdmV UL2018",              firstRun=315252, lastRun=316995),
+            "B" : EraLumiValues(Lumi=7061.0,  LumiSource="PdmV UL2018",              firstRun=317080, lastRun=319310),
+            "C" : EraLumiValues(Lumi=6895.0,  LumiSource="PdmV UL2018",              firstRun=319337, lastRun=320065),
+            "D" : EraLumiValues(Lumi=31740.0, LumiSource="PdmV UL2018",              firstRun=320673, lastRun=325175),
+        },
+    }
+
+    # Families of parameterised (signal) samples. The named groups of each pattern become the parameter columns of the grid,
+    # numbers written with a "p" as decimal separator (e.g. "100p0") are converted to floats.
+    __signal_grid_patterns = {
+        "ZPrimeToTT"               : r"ZPrimeToTT_M(?P<mass>\d+)_W(?P<width>\d+)",
+        "ZprimeToTT"               : r"ZprimeToTT_M(?P<mass>\d+)_W(?P<width>\d+)",
+        "ZprimeToZHToZlepHinc"     : r"ZprimeToZHToZlepHinc-(?P<mass>\d+)",
+        "ZprimeToZHToZinvHinc"     : r"ZprimeToZHToZinvHinc-(?P<mass>\d+)",
+        "AToZHToLLTTbar"           : r"AToZHToLLTTbar_MA-(?P<mA>\d+)_MH-(?P<mH>\d+)",
+        "AZHToLLTT"                : r"AZHToLLTT_mA(?P<mA>\d+)_mH(?P<mH>\d+)",
+        "HscalarToTTTo1L1Nu2J"     : r"HscalarToTTTo1L1Nu2J_m(?P<mass>\d+)_w(?P<width>\d+p\d+)_(?P<component>res|int)",
+        "HpseudoToTTTo1L1Nu2J"     : r"HpseudoToTTTo1L1Nu2J_m(?P<mass>\d+)_w(?P<width>\d+p\d+)_(?P<component>res|int)",
+        "RSGluonToTT"              : r"RSGluonToTT_M-(?P<mass>\d+)",
+        "TstarTstarToTgluonTgluon" : r"TstarTstarToTgluonTgluon_M-(?P<mass>\d+)",
+        "TstarTstarToTgammaTgamma" : r"TstarTstarToTgammaTgamma_M-(?P<mass>\d+)",
+    }
 
     __values_dict = {
 
@@ -777,7 +1142,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=2680294258.52,
@@ -794,7 +1159,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=39046225860.2,
@@ -811,7 +1176,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=30289246641.2,
@@ -828,7 +1193,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_hdampDOWN" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1197862430.31,
@@ -845,7 +1210,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_hdampDOWN" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=13961893555.7,
@@ -862,7 +1227,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_hdampDOWN" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=11446167870.6,
@@ -879,7 +1244,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_hdampUP" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1061555213.51,
@@ -896,7 +1261,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_hdampUP" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=16817574381.2,
@@ -913,7 +1278,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_hdampUP" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=9358050857.84,
@@ -930,7 +1295,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_CR1" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1101750927.61,
@@ -947,7 +1312,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_CR1" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=16834547125.1,
@@ -964,7 +1329,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_CR1" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=12338759466.1,
@@ -981,7 +1346,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_CR2" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1201120348.24,
@@ -998,7 +1363,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_CR2" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=16811187345.3,
@@ -1015,7 +1380,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_CR2" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=12402704586.9,
@@ -1032,7 +1397,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_erdON" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1160896376.92,
@@ -1049,7 +1414,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_erdON" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=16647142258.9,
@@ -1066,7 +1431,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_erdON" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=11826044665.7,
@@ -1083,7 +1448,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_TuneCP5down" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1200799748.55,
@@ -1100,7 +1465,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_TuneCP5down" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=16533387862.2,
@@ -1117,7 +1482,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_TuneCP5down" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=11678002502.4,
@@ -1134,7 +1499,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_TuneCP5up" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=734714642.148,
@@ -1151,7 +1516,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_TuneCP5up" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=13853464424.1,
@@ -1168,7 +1533,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_TuneCP5up" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=8903470364.36,
@@ -1185,7 +1550,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_mtop171p5" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1231199807.43,
@@ -1202,7 +1567,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_mtop171p5" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=16289641849.4,
@@ -1219,7 +1584,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_mtop171p5" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=10307328866.2,
@@ -1236,7 +1601,7 @@ class MCSampleValuesHelper():
         },
 
         "TTTo2L2Nu_mtop173p5" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.105, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=1168781991.29,
@@ -1253,7 +1618,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToSemiLeptonic_mtop173p5" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.438, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=15777434608.0,
@@ -1270,7 +1635,7 @@ class MCSampleValuesHelper():
         },
 
         "TTToHadronic_mtop173p5" : {
-            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO"),
+            "CrossSection" : XSValues(XSec_13TeV=831.76, XSecUp_13TeV=40.25, XSecDown_13TeV=45.63, XSecSource_13TeV="https://twiki.cern.ch/twiki/bin/view/LHCPhysics/TtbarNNLO (uncertainties: scale +19.77 -29.20 and PDF+alphaS +-35.06 added in quadrature)"),
             "BranchingRatio" : BRValues(BRat_13TeV=0.457, BRatSource_13TeV="https://pdg.lbl.gov/2020/reviews/rpp2020-rev-top-quark.pdf (page 2)"),
             "NEvents" : NEventsValues(
                 NEVT_UL16preVFP=11769768729.4,
@@ -7461,20 +7826,188 @@ class MCSampleValuesHelper():
 
     }
 
+    # Bumped whenever the structure of the database changes (periods, signal families), so that memoised results computed from an
+    # older state can be recognised. Changes of single processes (see update_values) only bump the generation of these processes.
+    __values_generation = 0
+    __sample_generations = {}
+
     def __init__(self, extra_dicts=None):
 
+        self.__lumi_cache = {}
+        self.__lumi_cache_generation = self.__values_generation
+        self.__lumi_cache_hits = 0
+        self.__lumi_cache_misses = 0
+
         if extra_dicts is not None:
-            if type(extra_dicts) == dict:
-                self.__values_dict.update(extra_dicts)
-            elif type(extra_dicts) == list:
-                for ed in extra_dicts:
-                    self.__values_dict.update(ed)
+            self.update_values(extra_dicts)
+
+    def update_values(self, extra_dicts):
+        """Add or override entries of the __values_dict and invalidate the memoised results depending on them
+
+        Only the get_lumi results of the updated processes are invalidated. The value store, the name index and the sample
+        information are updated in place, the XML and DAS indices are only rebuilt if an XMLname entry changed and the signal
+        grids only if a new (not interpolated) process was added.
+
+        Args:
+            extra_dicts (:obj:`dict` or :obj:`list` of :obj:`dict`): Extra cross sections and k-factors to add to the __values_dict.
+        """
+        if type(extra_dicts) == dict:
+            extra_dicts = [extra_dicts]
+        if type(extra_dicts) != list:
+            return
+        store = self.get_value_store()
+        name_index = self.__name_index if MCSampleValuesHelper.__name_index_generation == self.__values_generation else None
+        sample_info = self.__sample_info if MCSampleValuesHelper.__sample_info_generation == self.__values_generation else None
+        for ed in extra_dicts:
+            for name, values in ed.items():
+                previous = self.__values_dict.get(name)
+                self.__values_dict[name] = values
+                MCSampleValuesHelper.__sample_generations[name] = self.__sample_generations.get(name, 0) + 1
+                if name_index is not None:
+                    name_index.add(name)
+                if sample_info is not None:
+                    sample_info[name] = self.__derive_sample_info(name, values)
+                if (previous or {}).get("XMLname") != values.get("XMLname"):
+                    MCSampleValuesHelper.__xml_index_generation = -1
+                    MCSampleValuesHelper.__das_index_generation = -1
+                if previous is None and not name in self.__interpolated_names:
+                    MCSampleValuesHelper.__signal_grid_cache_generation = -1
+
+    __value_store = None
+    __value_store_generation = -1
+
+    def get_value_store(self):
+        """Return the SampleValueStore used for all lookups, built from the __values_dict
+
+        The namedtuples of the __values_dict remain the authoring format. They are compiled into the store once, after which
+        the __values_dict is replaced by a StoredValues view of the store (rebuilding the tuples on access), so that the values
+        are not held twice. Entries added with update_values are added to the store incrementally.
+        """
+        if MCSampleValuesHelper.__value_store_generation != self.__values_generation:
+            store = SampleValueStore([(key, prefix, default) for key, (prefix, default) in self.__key_field_map.items()], self.__years+self.__energies)
+            for name, values in self.__values_dict.items():
+                store.add(name, values)
+            value_types = {key: getattr(MCSampleValuesHelper, type_name) for key, type_name in self.__value_type_names.items()}
+            MCSampleValuesHelper.__values_dict = StoredValues(store, value_types)
+            MCSampleValuesHelper.__value_store = store
+            MCSampleValuesHelper.__value_store_generation = self.__values_generation
+        return MCSampleValuesHelper.__value_store
+
+    @classmethod
+    def get_periods(cls):
+        """Return the lists of years and energies (including those of the lazy shards), e.g. (["UL16preVFP",...,"2022"], ["13TeV","13p6TeV"])"""
+        cls().load_lazy_shards()
+        return list(cls.__years), list(cls.__energies)
+
+    @classmethod
+    def get_years(cls, energy=None):
+        """Return the years taken at an energy (default: all years, including those of the lazy shards), e.g. get_years("13p6TeV") -> ["2022"]"""
+        cls().load_lazy_shards()
+        return [year for year in cls.__years if energy is None or cls.__year_energies.get(year, energy) == energy]
+
+    @classmethod
+    def register_period(cls, period, energy=False, year_energy=None):
+        """Add a data-taking period (year) or an energy at runtime, e.g. register_period("2022", year_energy="13p6TeV") or register_period("13p6TeV", energy=True)
+
+        year_energy is the energy at which a year was taken (used by get_years). The value types (XSValues, NEventsValues, ...) are regenerated with the fields of the new period. Tuples created
+        before keep their fields, the missing ones count as unset. Lookups go through the period ids of the SampleValueStore,
+        so their cost does not depend on the number of periods.
+        """
+        if not energy and year_energy is not None:
+            cls.__year_energies[period] = year_energy
+        if period in cls.__years+cls.__energies:
+            return
+        (cls.__energies if energy else cls.__years).append(period)
+        periods = cls.__years+cls.__energies
+        for key, type_name in cls.__value_type_names.items():
+            prefix, default = cls.__key_field_map[key]
+            defaults = [default, "", 0.0, 0.0] if key in cls.__uncertainty_keys else [default, ""]
+            field_names = [prefix+mode+"_"+val for val in periods for mode in ["", "Source", "Up", "Down"][:len(defaults)]]
+            setattr(cls, type_name, namedtuple_with_defaults(type_name, field_names, defaults*len(periods)))
+        MCSampleValuesHelper.__values_generation += 1
+
+    # Shards which are only loaded on the first lookup for one of their periods, so that jobs of other periods don't pay for them.
+    # Queries over the whole database (search, get_sample_info(), the XML and DAS indices, get_years, ...) load all of them first
+    # and queries for a period (get_data_samples, get_data_lumi, get_weights, ...) the shards of the period, so that their results
+    # don't depend on which lookups were done before.
+    __lazy_shards = {
+        "Run3_124X_v1/Run3_2022_values.json" : ["2022", "13p6TeV"],
+        "RunII_102X_values.json"             : ["2016v2", "2016v3", "2017", "2018"],
+    }
+    __loaded_shards = set()
+
+    @classmethod
+    def get_lazy_shards(cls):
+        """Return {shard path relative to the repository: periods} of the lazily loaded shards"""
+        return {path: list(periods) for path, periods in cls.__lazy_shards.items()}
+
+    def load_lazy_shards(self, periods=None):
+        """Load the lazy shards providing any of the given periods (default: all lazy shards), e.g. before listing all processes"""
+        for path, shard_periods in self.__lazy_shards.items():
+            if path in self.__loaded_shards or (periods is not None and not any(p in shard_periods for p in periods)):
+                continue
+            MCSampleValuesHelper.__loaded_shards.add(path)
+            self.load_shard(os.path.join(os.path.dirname(os.path.abspath(__file__)), path))
+
+    def __load_periods(self, energy, year):
+        store = self.get_value_store()
+        if not (energy in store.period_ids and year in store.period_ids) and len(self.__loaded_shards) < len(self.__lazy_shards):
+            self.load_lazy_shards([energy, year])
+            store = self.get_value_store()
+        return store
+
+    def load_shard(self, path):
+        """Add the processes of a JSON shard file to the database
+
+        A shard lists the periods it needs and the values per process, with the field names of the value types:
+            {"years": {"2022": "13p6TeV"}, "energies": ["13p6TeV"],
+             "samples": {"JetMET_Run2022C": {"NEvents": {"NEVT_2022": 12345}, "XMLname": {"Xml_2022": "Run3_124X_v1/..."}}}}
+        The years are given as a list or as {year: energy}. Unknown periods are registered (see register_period) before the
+        values are added with update_values. Processes which are already defined are extended by the fields of the shard, a
+        field which is already set raises a KeyError (a shard never overrides values). A process may also give its
+        "SampleInfo" ({"isData": true, "era": "B"}, see get_sample_info). An optional "eras" entry
+        {year: {era: {"Lumi": ..., "LumiSource": ..., "firstRun": ..., "lastRun": ...}}} adds integrated luminosities of run
+        eras (see set_era_lumi).
+
+        Returns:
+            :obj:`list` of `str`: The names of the processes added or extended
+        """
+        import json
+        with open(path) as f:
+            shard = json.load(f)
+        years = shard.get("years", [])
+        for year in years:
+            self.register_period(year, year_energy=years[year] if isinstance(years, dict) else None)
+        for energy in shard.get("energies", []):
+            self.register_period(energy, energy=True)
+        for year, eras in shard.get("eras", {}).items():
+            for era, values in eras.items():
+                self.set_era_lumi(year, era, values["Lumi"], values.get("LumiSource", ""), (values.get("firstRun", -1), values.get("lastRun", -1)))
+        values = {}
+        for name, tuples in shard.get("samples", {}).items():
+            values[name] = dict(self.__values_dict.get(name, {}))
+            for key, fields in tuples.items():
+                if not key in self.__value_type_names and key != "SampleInfo":
+                    raise KeyError("ERROR MCSampleValuesHelper::Unknown key \"" + str(key) + "\" for process \"" + str(name) + "\" in " + str(path))
+                value_type = self.SampleInfo if key == "SampleInfo" else getattr(MCSampleValuesHelper, self.__value_type_names[key])
+                unknown = [field for field in fields if not field in value_type._fields]
+                if len(unknown) > 0:
+                    raise KeyError("ERROR MCSampleValuesHelper::Unknown field(s) " + str(unknown) + " for process \"" + str(name) + "\" in " + str(path))
+                defaults = value_type()
+                existing = value_type(**values[name][key]._asdict()) if key in values[name] else defaults
+                conflicts = [field for field in fields if existing.__getattribute__(field) != defaults.__getattribute__(field)]
+                if len(conflicts) > 0:
+                    raise KeyError("ERROR MCSampleValuesHelper::The field(s) " + str(conflicts) + " of process \"" + str(name) + "\" in " + str(path) + " are already set")
+                values[name][key] = existing._replace(**fields)
+        self.update_values(values)
+        return list(values)
 
     def get_value(self, name, energy, year, key, strict=False, info = ""):
         """Return the value for a given MC sample, energy or year, and information type
 
         If information is stored for both an energy and a year, the value for the given energy will be preferentially returned.
-        If strict checking is turned on the function will raise an error if a given dictionary or piece of information isn't found.
+        If strict checking is turned on the function will raise an error if a given dictionary or piece of information isn't found,
+          or if the energy or the year is unknown (unless a value is set for the energy).
           Otherwise the default value will be returned with no error (i.e. will return 1.0 for kFactors)
 
         Args:
@@ -7483,28 +8016,605 @@ class MCSampleValuesHelper():
             year (`str`): The production year of the MC sample
             key (`str`): The type of information being requested. The Options can be found in the __key_field_map.
             strict (`bool`): Whether or not to perform strict checking of the dictionary
+            info (`str`): "Source" for the source, "Up"/"Down" for the absolute uncertainties (0 if not given) of the value
 
         """
-        fields = [self.__key_field_map[key][0]+info+"_"+energy,self.__key_field_map[key][0]+info+"_"+year]
-        if not name in self.__values_dict:
-            raise KeyError("ERROR MCSampleValuesHelper::Unknown process \"" + str(name) + "\"")
-        if not key in self.__values_dict[name]:
+        store = self.__load_periods(energy, year)
+        if not name in store.sample_ids and len(self.__loaded_shards) < len(self.__lazy_shards):
+            # The process may be defined by a shard of other periods only (e.g. a legacy process looked up for a year it lacks)
+            self.load_lazy_shards()
+            store = self.get_value_store()
+        missing = 0.0 if info in store.uncertainty_infos else self.__key_field_map[key][1]
+        if not name in store.sample_ids:
+            raise KeyError("ERROR MCSampleValuesHelper::Unknown process \"" + str(name) + "\"" + self.__suggestion_text(name))
+        if not store.has_key(name, key):
             if strict:
                 print(self.__values_dict[name])
                 raise KeyError("ERROR MCSampleValuesHelper::The process \"" + str(name) + "\" does not contain a " + str(key) + " tuple")
             else:
-                return self.__key_field_map[key][1]
-        if not any(f in self.__values_dict[name][key]._fields for f in fields):
-            if strict:
+                return self.__fallback(name, key, missing)
+        default = "" if info == "Source" else missing
+        if not energy in store.period_ids or not year in store.period_ids:
+            # Unknown periods are an error in strict mode, unless a value is set for the (known) energy
+            value = store.get(name, key, info, energy, None, default, self.__unset) if energy in store.period_ids else self.__unset
+            if strict and value is self.__unset:
+                fields = [self.__key_field_map[key][0]+info+"_"+energy,self.__key_field_map[key][0]+info+"_"+year]
                 print(self.__values_dict[name][key])
                 raise KeyError("ERROR MCSampleValuesHelper::The " + str(key) + " tuple for process \"" + str(name) + "\" does contain the key(s) \"" + str(fields) + "\"")
-            else:
-                self.__key_field_map[key][1]
+            if not energy in store.period_ids and not year in store.period_ids:
+                return self.__fallback(name, key, missing)
+
+        value = store.get(name, key, info, energy, year, default, self.__unset)
+        return self.__fallback(name, key, default) if value is self.__unset else value
+
+    __unset = object()
+
+    def __fallback(self, name, key, default):
+        # Every lookup which returns the default value because nothing is stored goes through here (counted by the LookupProfiler)
+        return default
+
+    def get_values_array(self, key, energy, year, names=None, info=""):
+        """Return the numerical values of a key (e.g. "CrossSection") for many processes at once
+
+        The lazy shards of the energy and year are loaded first, and all of them if names is None.
+
+        Args:
+            names (:obj:`list` of `str`): The processes, all processes in the order of get_value_store().names if None
+            info (`str`): "Up"/"Down" for the absolute uncertainties of the values (0 if not given)
+
+        Returns:
+            :obj:`array.array` of `float`: Unset values are replaced by the default of the key (see __key_field_map)
+        """
+        if names is None:
+            self.load_lazy_shards()
+        return self.__load_periods(energy, year).column(key, energy, year, 0.0 if info != "" else self.__key_field_map[key][1], names, info)
+
+    __name_index = None
+    __name_index_generation = -1
+
+    def get_name_index(self):
+        """Return the SampleNameIndex over all process names, rebuilt only if the __values_dict changed"""
+        self.load_lazy_shards()
+        if MCSampleValuesHelper.__name_index_generation != self.__values_generation:
+            MCSampleValuesHelper.__name_index = SampleNameIndex(self.__values_dict.keys())
+            MCSampleValuesHelper.__name_index_generation = self.__values_generation
+        return MCSampleValuesHelper.__name_index
+
+    def search(self, pattern):
+        """Return the sorted list of process names matching a shell-style pattern, e.g. helper.search("ZPrimeToTT_M*_W*0")"""
+        return self.get_name_index().search(pattern)
+
+    def suggest(self, name, max_suggestions=5):
+        """Return the process names most similar to a (possibly misspelled) name"""
+        return self.get_name_index().suggest(name, max_suggestions)
+
+    def __suggestion_text(self, name):
+        suggestions = self.suggest(str(name), 3)
+        if len(suggestions) == 0:
+            return ""
+        return ". Did you mean " + " or ".join("\"" + s + "\"" for s in suggestions) + "?"
+
+    __xml_index = None
+    __xml_index_generation = -1
+    __run_era_pattern = re.compile(r"Run\d{4}[A-H]")
+    __mc_campaign_pattern = re.compile(r"RunII\w*?(?P<campaign>UL\d\d)MiniAOD(?P<apv>APV)?")
+
+    def get_xml_index(self):
+        """Return the reverse index from XML path to the (process name, period) pairs referring to it
+
+        The index is built with a single pass over the __values_dict and rebuilt only if the __values_dict changed.
+        """
+        self.load_lazy_shards()
+        if MCSampleValuesHelper.__xml_index_generation != self.__values_generation:
+            index = {}
+            for name, values in self.__values_dict.items():
+                if not "XMLname" in values:
+                    continue
+                xml_values = values["XMLname"]
+                for field in xml_values._fields:
+                    if field.startswith("Xml_") and xml_values.__getattribute__(field) != "":
+                        index.setdefault(os.path.normpath(xml_values.__getattribute__(field)), []).append((name, field[len("Xml_"):]))
+            MCSampleValuesHelper.__xml_index = index
+            MCSampleValuesHelper.__xml_index_generation = self.__values_generation
+        return MCSampleValuesHelper.__xml_index
+
+    def get_samples_for_xml(self, xml):
+        """Return the (process name, period) pairs using an XML file (path relative to the repository), empty if it is unused"""
+        return list(self.get_xml_index().get(os.path.normpath(xml), []))
+
+    def get_orphan_xmls(self, xmls):
+        """Return the XML files (paths relative to the repository) which are not used by any process"""
+        index = self.get_xml_index()
+        return [xml for xml in xmls if not os.path.normpath(xml) in index]
+
+    def get_shared_xmls(self):
+        """Return {XML path: [(process name, period), ...]} for all XML files used by more than one process"""
+        return {xml: users for xml, users in self.get_xml_index().items() if len(set(name for name, _ in users)) > 1}
+
+    @staticmethod
+    def __normalise_dataset(name):
+        return re.sub(r"[-_]+", "_", name.replace("Tune", "").replace("13TeV", "")).strip("_").lower()
+
+    @classmethod
+    def xml_matches_source(cls, xml, source):
+        """Check whether the filename of an XML file agrees with the DAS name it was produced from
+
+        For data the primary dataset and the run era (e.g. Run2018A) have to agree, for MC the primary dataset (ignoring the
+        "Tune" and "13TeV" parts) and the UL campaign (e.g. UL16APV). A source listing several datasets in braces matches if
+        any of their run eras agrees. The source is normalised with parse_das_name, so that e.g. a missing leading slash is tolerated.
+
+        Returns:
+            `bool` or None: None if the source is empty or a private (USER) dataset, which can't be compared, False if it is no DAS name
+        """
+        if source.strip() == "":
+            return None
+        expanded = cls.expand_braces(source.strip())
+        if len(expanded) > 1:
+            results = [cls.xml_matches_source(xml, alternative) for alternative in expanded]
+            return True if True in results else (None if None in results else False)
+        parsed = cls.parse_das_name(source)
+        if parsed is None:
+            return False
+        if parsed["tier"] == "USER":
+            return None
+        primary, processed, tier = parsed["primary"], parsed["processed"], parsed["tier"]
+        basename = os.path.basename(xml)[:-len(".xml")] if xml.endswith(".xml") else os.path.basename(xml)
+        if tier == "MINIAOD":
+            run = cls.__run_era_pattern.search(basename)
+            return basename.startswith(primary+"_") and run is not None and run.group(0) in cls.__run_era_pattern.findall(processed)
+        campaign = cls.__mc_campaign_pattern.search(processed)
+        if campaign is None:
+            return False
+        normalised = cls.__normalise_dataset(basename)
+        tag = (campaign.group("campaign") + (campaign.group("apv") or "")).lower()
+        return normalised.startswith(cls.__normalise_dataset(primary)+"_") and re.search(tag+r"(_v\d+)?$", normalised) is not None
+
+    def get_xml_source_mismatches(self):
+        """Return the (process name, period, XML path, DAS name) of all XML files whose filename disagrees with their XmlSource"""
+        mismatches = []
+        for xml, users in self.get_xml_index().items():
+            for name, period in users:
+                source = self.__values_dict[name]["XMLname"].__getattribute__("XmlSource_"+period)
+                if self.xml_matches_source(xml, source) is False:
+                    mismatches.append((name, period, xml, source))
+        return mismatches
+
+    __das_index = None
+    __das_index_generation = -1
+    __brace_pattern = re.compile(r"\{([^{}]*)\}")
+
+    @classmethod
+    def expand_braces(cls, text):
+        """Expand shell-style braces, e.g. "Run2016B-{ver1,ver2}_HIPM" -> ["Run2016B-ver1_HIPM", "Run2016B-ver2_HIPM"]"""
+        match = cls.__brace_pattern.search(text)
+        if match is None:
+            return [text]
+        expanded = []
+        for alternative in match.group(1).split(","):
+            expanded.extend(cls.expand_braces(text[:match.start()] + alternative + text[match.end():]))
+        return expanded
+
+    @staticmethod
+    def parse_das_name(name):
+        """Split a DAS dataset name into its parts
+
+        The processed dataset follows the "<acquisition era>-<processing string>-<version>" convention, e.g.
+        "/SingleMuon/Run2018A-UL2018_MiniAODv2_GT36-v1/MINIAOD" has the era "Run2018A" and the processing string
+        "UL2018_MiniAODv2_GT36", and "/WW_TuneCP5_13TeV-pythia8/RunIISummer20UL17MiniAODv2-106X_mc2017_realistic_v9-v2/MINIAODSIM"
+        the era "RunIISummer20UL17MiniAODv2". Surrounding whitespace and a missing leading slash are tolerated.
+
+        Returns:
+            :obj:`dict`: With the keys "name" (normalised), "primary", "processed", "era", "processing", "version" and "tier", or None
+        """
+        parts = name.strip().strip("/").split("/")
+        if len(parts) != 3 or "" in parts:
+            return None
+        primary, processed, tier = parts
+        era, _, rest = processed.partition("-")
+        processing, _, version = rest.rpartition("-")
+        if processing == "":
+            processing, version = version, ""
+        return {"name": "/" + "/".join(parts), "primary": primary, "processed": processed, "era": era,
+                "processing": processing, "version": version, "tier": tier}
+
+    def get_das_index(self):
+        """Return the index of all DAS names of the XmlSource fields, brace expanded
+
+        The index is rebuilt only if the __values_dict changed.
+
+        Returns:
+            :obj:`dict`: {"names": {DAS name: [(process name, period, XML path), ...]}, "primary": {primary dataset: set of DAS
+                names}, "era": {...}, "processing": {...}}
+        """
+        self.load_lazy_shards()
+        if MCSampleValuesHelper.__das_index_generation != self.__values_generation:
+            index = {"names": {}, "primary": {}, "era": {}, "processing": {}}
+            for name, values in self.__values_dict.items():
+                if not "XMLname" in values:
+                    continue
+                xml_values = values["XMLname"]
+                for field in xml_values._fields:
+                    if not field.startswith("XmlSource_") or xml_values.__getattribute__(field).strip() == "":
+                        continue
+                    period = field[len("XmlSource_"):]
+                    xml = xml_values.__getattribute__("Xml_"+period) if "Xml_"+period in xml_values._fields else ""
+                    for source in self.expand_braces(xml_values.__getattribute__(field)):
+                        parsed = self.parse_das_name(source)
+                        if parsed is None:
+                            continue
+                        index["names"].setdefault(parsed["name"], []).append((name, period, xml))
+                        for key in ("primary", "era", "processing"):
+                            index[key].setdefault(parsed[key], set()).add(parsed["name"])
+            MCSampleValuesHelper.__das_index = index
+            MCSampleValuesHelper.__das_index_generation = self.__values_generation
+        return MCSampleValuesHelper.__das_index
+
+    def lookup_das(self, das_name):
+        """Return the (process name, period, XML path) entries produced from a DAS dataset, empty if it is unknown"""
+        parsed = self.parse_das_name(das_name)
+        if parsed is None:
+            return []
+        return list(self.get_das_index()["names"].get(parsed["name"], []))
+
+    def find_datasets(self, primary=None, era=None, processing=None):
+        """Return the sorted DAS names matching all given parts, e.g. find_datasets(primary="SingleMuon", era="Run2018A")
+
+        Args:
+            primary (`str`): Primary dataset, e.g. "SingleMuon"
+            era (`str`): Acquisition era, e.g. "Run2018A" or "RunIISummer20UL18MiniAODv2"
+            processing (`str`): Processing string, e.g. "UL2018_MiniAODv2_GT36"
+        """
+        index = self.get_das_index()
+        selected = None
+        for key, value in (("primary", primary), ("era", era), ("processing", processing)):
+            if value is None:
+                continue
+            names = index[key].get(value, set())
+            selected = set(names) if selected is None else selected & names
+        return sorted(index["names"] if selected is None else selected)
+
+    __sample_info = None
+    __sample_info_generation = -1
+    __data_name_pattern = re.compile(r"_Run(?P<era>[A-H])$")
+
+    def __derive_sample_info(self, name, values):
+        info = values.get("SampleInfo", self.SampleInfo())
+        tiers, eras = set(), set()
+        if "XMLname" in values:
+            xml_values = values["XMLname"]
+            for field in xml_values._fields:
+                if not field.startswith("XmlSource_"):
+                    continue
+                for source in self.expand_braces(xml_values.__getattribute__(field)):
+                    parsed = self.parse_das_name(source)
+                    if parsed is not None:
+                        tiers.add(parsed["tier"])
+                        eras.update(run[-1] for run in self.__run_era_pattern.findall(parsed["era"]))
+        name_match = self.__data_name_pattern.search(name)
+        is_data = info.isData
+        if is_data is None:
+            is_data = "MINIAOD" in tiers if len(tiers & {"MINIAOD", "MINIAODSIM"}) > 0 else name_match is not None
+        era = info.era
+        if era == "" and is_data:
+            era = name_match.group("era") if name_match is not None else ("".join(eras) if len(eras) == 1 else "")
+        return self.SampleInfo(bool(is_data), era)
+
+    def get_sample_info(self, name=None):
+        """Return the SampleInfo (data/MC flag and run era) of a process, or of all processes as a dictionary if name is None
+
+        The information is taken from the optional "SampleInfo" entry of a process. Otherwise a process is data if its
+        XmlSource datasets have the MINIAOD (not MINIAODSIM) tier, or, without XmlSource, if its name ends with _Run<era>.
+        The era is the letter of the run era, e.g. "C" for SingleMuon_RunC. The table is computed once for all processes and
+        rebuilt only if the __values_dict changed. All lazy shards are loaded for the table of all processes, for a single
+        process only if it is unknown otherwise.
+        """
+        if name is None or (not name in self.__values_dict and len(self.__loaded_shards) < len(self.__lazy_shards)):
+            self.load_lazy_shards()
+        if MCSampleValuesHelper.__sample_info_generation != self.__values_generation:
+            MCSampleValuesHelper.__sample_info = {n: self.__derive_sample_info(n, v) for n, v in self.__values_dict.items()}
+            MCSampleValuesHelper.__sample_info_generation = self.__values_generation
+        if name is None:
+            return MCSampleValuesHelper.__sample_info
+        if not name in MCSampleValuesHelper.__sample_info:
+            raise KeyError("ERROR MCSampleValuesHelper::Unknown process \"" + str(name) + "\"" + self.__suggestion_text(name))
+        return MCSampleValuesHelper.__sample_info[name]
+
+    def is_data(self, name):
+        return self.get_sample_info(name).isData
+
+    def get_era(self, name):
+        """Return the run era of a data process (e.g. "C"), an empty string for MC"""
+        return self.get_sample_info(name).era
+
+    def __available(self, name, energy, year):
+        return self.get_xml(name, energy, year) != "" or self.get_nevt(name, energy, year) >= 0
+
+    def get_data_samples(self, energy, year, era=None):
+        """Return the sorted names of the data processes available (with an XML file or NEVT) for a year, e.g. all UL17 era C samples
+
+        Args:
+            era (`str` or :obj:`list` of `str`): Only return processes of these run eras, e.g. "C" or ["B","C"]
+        """
+        eras = None if era is None else set([era] if isinstance(era, str) else era)
+        self.__load_periods(energy, year)
+        return sorted(name for name, info in self.get_sample_info().items()
+                      if info.isData and (eras is None or info.era in eras) and self.__available(name, energy, year))
+
+    def get_mc_samples(self, energy, year):
+        """Return the sorted names of the MC processes available (with an XML file or NEVT) for a year"""
+        self.__load_periods(energy, year)
+        return sorted(name for name, info in self.get_sample_info().items() if not info.isData and self.__available(name, energy, year))
+
+    @classmethod
+    def set_era_lumi(cls, year, era, lumi, source="", runs=(-1, -1)):
+        """Add or override the integrated luminosity (in pb^-1) of a run era, e.g. for a custom JSON"""
+        cls.__era_lumi_dict.setdefault(year, {})[era] = cls.EraLumiValues(float(lumi), source, runs[0], runs[1])
+
+    def get_eras(self, year):
+        """Return the sorted run eras with a known integrated luminosity for a year"""
+        self.load_lazy_shards([year])
+        return sorted(self.__era_lumi_dict.get(year, {}))
+
+    def get_era_lumi(self, year, era, info=""):
+        """Return the integrated luminosity in pb^-1 of a run era (info="Source" for its source)"""
+        self.load_lazy_shards([year])
+        if not era in self.__era_lumi_dict.get(year, {}):
+            raise KeyError("ERROR MCSampleValuesHelper::No integrated luminosity for era \"" + str(era) + "\" of \"" + str(year) + "\"")
+        return self.__era_lumi_dict[year][era].__getattribute__("Lumi"+info)
+
+    def get_era_runs(self, year, era):
+        """Return the (first run, last run) of a run era"""
+        self.load_lazy_shards([year])
+        values = self.__era_lumi_dict[year][era]
+        return (values.firstRun, values.lastRun)
+
+    def get_data_lumi(self, years, eras=None):
+        """Return the summed integrated luminosity in pb^-1 over any set of years and run eras
+
+        Args:
+            years (`str` or :obj:`list` of `str`): The data-taking periods, e.g. "UL17" or ["UL16preVFP","UL16postVFP"]
+            eras (`str` or :obj:`list` of `str`): The run eras, e.g. "C" or ["B","C"] (default: all eras of the years)
+        """
+        import math
+        years = [years] if isinstance(years, str) else years
+        self.load_lazy_shards(years)
+        eras = None if eras is None else set([eras] if isinstance(eras, str) else eras)
+        return math.fsum(values.Lumi for year in years for era, values in self.__era_lumi_dict.get(year, {}).items()
+                         if eras is None or era in eras)
+
+    def get_data_sample_lumis(self, names, year):
+        """Return the integrated luminosities in pb^-1 of the run eras of several data processes, as an array
+
+        Returns:
+            :obj:`array.array` of `float`: One entry per process, -1 for processes of an era without known luminosity
+        """
+        from array import array
+        self.load_lazy_shards([year])
+        table = self.__era_lumi_dict.get(year, {})
+        info = self.get_sample_info()
+        lumis = array("d", [-1.0])*len(names)
+        for i, name in enumerate(names):
+            if not info[name].isData:
+                raise KeyError("ERROR MCSampleValuesHelper::The process \"" + str(name) + "\" is not a data sample")
+            if info[name].era in table:
+                lumis[i] = table[info[name].era].Lumi
+        return lumis
+
+    __signal_grid_cache = {}
+    __signal_grid_cache_generation = -1
+
+    @classmethod
+    def register_signal_grid(cls, family, pattern):
+        """Register a family of parameterised samples, given a regular expression with one named group per parameter"""
+        cls.__signal_grid_patterns[family] = pattern
+        cls.__values_generation += 1
+
+    @classmethod
+    def get_signal_families(cls):
+        return sorted(cls.__signal_grid_patterns.keys())
+
+    @staticmethod
+    def __convert_parameter(value):
+        try:
+            return float(value.replace("p","."))
+        except ValueError:
+            return value
+
+    def parse_signal_name(self, name):
+        """Return the tuple (family, parameters) for a parameterised sample name, or None if it belongs to no registered family
+
+        Example:
+            helper.parse_signal_name("AToZHToLLTTbar_MA-1000_MH-700") -> ("AToZHToLLTTbar", {"mA": 1000.0, "mH": 700.0})
+        """
+        for family, pattern in self.__signal_grid_patterns.items():
+            match = re.fullmatch(pattern, name)
+            if match is not None:
+                return family, {k: self.__convert_parameter(v) for k, v in match.groupdict().items()}
+        return None
+
+    def get_signal_points(self, family):
+        """Return the list of (name, parameters) of all samples of a family, ordered by the parameters in pattern order"""
+        self.load_lazy_shards()
+        if MCSampleValuesHelper.__signal_grid_cache_generation != self.__values_generation:
+            MCSampleValuesHelper.__signal_grid_cache = {}
+            MCSampleValuesHelper.__signal_grid_cache_generation = self.__values_generation
+        if family not in self.__signal_grid_cache:
+            if family not in self.__signal_grid_patterns:
+                raise KeyError("ERROR MCSampleValuesHelper::Unknown signal family \"" + str(family) + "\"")
+            pattern = re.compile(self.__signal_grid_patterns[family])
+            points = []
+            for name in self.__values_dict:
+                if name in self.__interpolated_names:
+                    continue
+                match = pattern.fullmatch(name)
+                if match is not None:
+                    points.append((name, {k: self.__convert_parameter(v) for k, v in match.groupdict().items()}))
+            points.sort(key=lambda point: tuple((isinstance(v, str), v) for v in point[1].values()))
+            self.__signal_grid_cache[family] = points
+        return self.__signal_grid_cache[family]
+
+    def get_signal_grid(self, family, energy, year, kFactor=False, Corrections=False, require_nevt=False):
+        """Return the cross sections, numbers of events and luminosities of a whole signal family as NumPy arrays
+
+        The returned dictionary contains the array "name", one array per parameter of the family (float, or str for non-numeric
+        parameters) and the float arrays "xs", "nevt" and "lumi", all ordered by the parameters. Missing values are NaN.
+
+        Args:
+            family (`str`): One of the families returned by get_signal_families
+            kFactor, Corrections (`bool`): Passed on to get_lumi
+            require_nevt (`bool`): Drop the points without a number of events for the requested year
+        """
+        import numpy as np
+        nan = float("nan")
+        rows = []
+        for name, parameters in self.get_signal_points(family):
+            xs = self.get_value(name, energy, year, "CrossSection", False)
+            nevt = self.get_value(name, energy, year, "NEvents", False)
+            if require_nevt and nevt < 0:
+                continue
+            lumi = self.get_lumi(name, energy, year, kFactor, Corrections) if (xs > 0 and nevt >= 0) else nan
+            rows.append((name, parameters, xs if xs >= 0 else nan, nevt if nevt >= 0 else nan, lumi))
+        columns = list(re.compile(self.__signal_grid_patterns[family]).groupindex.keys())
+        grid = {"name": np.array([row[0] for row in rows], dtype=str)}
+        for column in columns:
+            values = [row[1][column] for row in rows]
+            grid[column] = np.array(values, dtype=str if any(isinstance(v, str) for v in values) else np.float64)
+        grid["xs"] = np.array([row[2] for row in rows], dtype=np.float64)
+        grid["nevt"] = np.array([row[3] for row in rows], dtype=np.float64)
+        grid["lumi"] = np.array([row[4] for row in rows], dtype=np.float64)
+        return grid
+
+    __interpolated_names = set()
+    # Interpolation method used per (interpolated process, year)
+    __interpolated_methods = {}
+    __interpolation_methods = ["loglinear", "spline"]
+
+    @staticmethod
+    def __natural_cubic_spline(x, y, x0):
+        """Evaluate the natural cubic spline through the points (x, y) at x0 (x strictly increasing)"""
+        n = len(x)
+        h = [x[i+1]-x[i] for i in range(n-1)]
+        # Solve the tridiagonal system for the second derivatives, which vanish at both ends
+        m = [0.0]*n
+        if n > 2:
+            diag = [2.0*(h[i-1]+h[i]) for i in range(1, n-1)]
+            rhs = [6.0*((y[i+1]-y[i])/h[i]-(y[i]-y[i-1])/h[i-1]) for i in range(1, n-1)]
+            for i in range(1, len(diag)):
+                w = h[i]/diag[i-1]
+                diag[i] -= w*h[i]
+                rhs[i] -= w*rhs[i-1]
+            for i in reversed(range(len(diag))):
+                upper = h[i+1]*m[i+2] if i+1 < len(diag) else 0.0
+                m[i+1] = (rhs[i]-upper)/diag[i]
+        i = max(j for j in range(n-1) if x[j] <= x0)
+        t0, t1 = x[i+1]-x0, x0-x[i]
+        return (m[i]*t0**3+m[i+1]*t1**3)/(6.0*h[i]) + (y[i]/h[i]-m[i]*h[i]/6.0)*t0 + (y[i+1]/h[i]-m[i+1]*h[i]/6.0)*t1
+
+    @staticmethod
+    def __format_parameter(value, template):
+        """Format a parameter value in the same style as template, the corresponding text of an existing sample name"""
+        if isinstance(value, str):
+            return value
+        if float(value).is_integer() and "p" not in template:
+            return str(int(value))
+        return repr(float(value)).replace(".","p")
+
+    def add_interpolated_point(self, family, energy, year, mass, mass_parameter=None, method="loglinear", relative_parameters=(), **fixed_parameters):
+        """Interpolate the cross section of a signal family to an intermediate mass point and add it to the __values_dict
+
+        The cross section is interpolated in the mass parameter between the points of the family sharing the fixed parameters,
+        either linearly in log(xs) ("loglinear") or with a natural cubic spline in log(xs) ("spline"). No extrapolation is done.
+        The new sample is named after its neighbours, e.g. "ZPrimeToTT_M1100_W110", carries the interpolation details in its
+        XSecSource field and is excluded from get_signal_points. Repeated requests for the same point and method return the stored
+        result, a request with another method recomputes and replaces it.
 
-        if self.__values_dict[name][key].__getattribute__(fields[0]) != self.__key_field_map[key][1]:
-            return self.__values_dict[name][key].__getattribute__(fields[0])
+        Args:
+            family (`str`): One of the families returned by get_signal_families
+            mass (`float`): The value of the mass parameter to interpolate to
+            mass_parameter (`str`): The parameter to interpolate in, defaults to the first parameter of the family
+            method (`str`): "loglinear" or "spline"
+            relative_parameters (iterable of `str`): Fixed parameters which scale with the mass (e.g. a width of 10% of the mass)
+            fixed_parameters: Values of the remaining parameters, given for the requested mass
+
+        Returns:
+            `str`: The name of the (possibly newly added) sample
+
+        Example:
+            name = helper.add_interpolated_point("ZPrimeToTT", "13TeV", "UL17", 1100, width=110, relative_parameters=["width"])
+            helper.get_xs(name, "13TeV", "UL17")
+        """
+        import math
+        if method not in self.__interpolation_methods:
+            raise ValueError("ERROR MCSampleValuesHelper::Unknown interpolation method \"" + str(method) + "\", use one of " + str(self.__interpolation_methods))
+        points = self.get_signal_points(family)
+        pattern = re.compile(self.__signal_grid_patterns[family])
+        if mass_parameter is None:
+            mass_parameter = list(pattern.groupindex.keys())[0]
+        missing = [p for p in pattern.groupindex if p != mass_parameter and p not in fixed_parameters]
+        if len(missing) > 0:
+            raise ValueError("ERROR MCSampleValuesHelper::The parameter(s) " + str(missing) + " of family \"" + family + "\" have to be fixed")
+
+        def matches(parameters, point_mass, value_mass):
+            for p, value in fixed_parameters.items():
+                if p in relative_parameters:
+                    if not math.isclose(parameters[p]/point_mass, value/value_mass, rel_tol=1e-6): return False
+                elif parameters[p] != value:
+                    return False
+            return True
+
+        support = []
+        for name, parameters in points:
+            if not matches(parameters, parameters[mass_parameter], mass):
+                continue
+            xs = self.get_value(name, energy, year, "CrossSection", False)
+            if xs > 0:
+                support.append((parameters[mass_parameter], xs, name))
+        support.sort()
+        if len(support) < 2 or not (support[0][0] <= mass <= support[-1][0]):
+            raise ValueError("ERROR MCSampleValuesHelper::Cannot interpolate family \"" + family + "\" to " + mass_parameter + "=" + str(mass) + ", the available points with cross sections are " + str([p[0] for p in support]))
+
+        neighbour = min(support, key=lambda p: abs(p[0]-mass))
+        if neighbour[0] == mass:
+            return neighbour[2]
+        # Build the new name from the nearest neighbour by replacing its parameter values
+        new_parameters = dict(fixed_parameters)
+        new_parameters[mass_parameter] = mass
+        neighbour_name = neighbour[2]
+        match = pattern.fullmatch(neighbour_name)
+        name = neighbour_name
+        for group in sorted(pattern.groupindex, key=lambda g: match.start(g), reverse=True):
+            name = name[:match.start(group)] + self.__format_parameter(new_parameters[group], match.group(group)) + name[match.end(group):]
+        if name in self.__values_dict:
+            if self.__interpolated_methods.get((name, year)) == method and self.get_value(name, energy, year, "CrossSection", False) > 0:
+                return name
+            if name not in self.__interpolated_names:
+                raise ValueError("ERROR MCSampleValuesHelper::The interpolated point \"" + name + "\" clashes with an existing sample")
+
+        masses = [p[0] for p in support]
+        logs = [math.log(p[1]) for p in support]
+        lower = max(i for i in range(len(masses)-1) if masses[i] <= mass)
+        if method == "loglinear":
+            fraction = (mass-masses[lower])/(masses[lower+1]-masses[lower])
+            xs = math.exp(logs[lower] + fraction*(logs[lower+1]-logs[lower]))
+            source = "Interpolated (loglinear in " + mass_parameter + ") between " + support[lower][2] + " and " + support[lower+1][2]
         else:
-            return self.__values_dict[name][key].__getattribute__(fields[1])
+            xs = math.exp(self.__natural_cubic_spline(masses, logs, mass))
+            source = "Interpolated (spline in " + mass_parameter + ") from " + str(len(support)) + " points between " + support[0][2] + " and " + support[-1][2]
+
+        fields = self.__values_dict[name]["CrossSection"]._asdict() if name in self.__values_dict else {}
+        fields["XSec_"+year] = xs
+        fields["XSecSource_"+year] = source
+        MCSampleValuesHelper.__interpolated_names.add(name)
+        MCSampleValuesHelper.__interpolated_methods[(name, year)] = method
+        self.update_values({name: {"CrossSection": self.XSValues(**fields)}})
+        return name
+
+    def interpolate_xs(self, family, energy, year, mass, **kwargs):
+        """Return the cross section of a signal family interpolated to the given mass, see add_interpolated_point"""
+        return self.get_xs(self.add_interpolated_point(family, energy, year, mass, **kwargs), energy, year)
+
+    def is_interpolated(self, name):
+        return name in self.__interpolated_names
 
     def get_xs(self, name, energy, year, info=""):
         return self.get_value(name, energy, year, "CrossSection", True, info)
@@ -7525,20 +8635,295 @@ class MCSampleValuesHelper():
         return self.get_value(name, energy, year, "XMLname", False, info)
 
     def get_lumi(self, name, energy, year, kFactor=False, Corrections=False):
+        """Return the luminosity equivalent of a given MC sample, i.e. nevt/(xsec*br[*kfactor][*correction])
+
+        Data samples (see get_sample_info) raise a KeyError.
+
+        Results are memoised per set of arguments. A result is invalidated automatically when the values of its process change
+        (see update_values), the whole cache when periods are registered. It can be inspected with lumi_cache_info.
+        """
+        if self.__lumi_cache_generation != self.__values_generation:
+            self.clear_lumi_cache()
+        self.__load_periods(energy, year)
+        if self.is_data(name):
+            raise KeyError("ERROR MCSampleValuesHelper::The process \"" + str(name) + "\" is a data sample, which has no luminosity equivalent")
+        cache_key = (name, energy, year, bool(kFactor), bool(Corrections))
+        sample_generation = self.__sample_generations.get(name, 0)
+        cached = self.__lumi_cache.get(cache_key)
+        if cached is not None and cached[1] == sample_generation:
+            self.__lumi_cache_hits += 1
+            return cached[0]
+        self.__lumi_cache_misses += 1
+        lumi = self.__compute_lumi(name, energy, year, kFactor, Corrections)
+        self.__lumi_cache[cache_key] = (lumi, sample_generation)
+        return lumi
+
+    def __compute_lumi(self, name, energy, year, kFactor, Corrections):
         xsec = self.get_xs(name, energy, year)
         xsec *= self.get_br(name, energy, year)
         if kFactor: xsec *= self.get_kfactor(name, energy, year)
         if Corrections: xsec *= self.get_corr(name, energy, year)
         return abs(self.get_nevt(name, energy, year))/xsec
 
+    def __normalisation_columns(self, year, energy, names):
+        energy = self.__year_energies.get(year, self.__energies[0]) if energy is None else energy
+        store = self.__load_periods(energy, year)
+        info = self.get_sample_info()
+        xs_default, nevt_default = self.__key_field_map["CrossSection"][1], self.__key_field_map["NEvents"][1]
+        if names is None:
+            candidates = [name for name in store.names if not info[name].isData]
+            xs = self.get_values_array("CrossSection", energy, year, candidates)
+            nevt = self.get_values_array("NEvents", energy, year, candidates)
+            names = [name for i, name in enumerate(candidates) if xs[i] != xs_default and nevt[i] != nevt_default and nevt[i] != 0]
+        else:
+            data = [name for name in names if self.is_data(name)]
+            if len(data) > 0:
+                raise KeyError("ERROR MCSampleValuesHelper::The process(es) " + str(data) + " are data samples, which have no normalisation weight")
+        columns = {key: self.get_values_array(key, energy, year, names) for key in ["CrossSection", "NEvents", "BranchingRatio", "kFactor", "Correction"]}
+        missing = [name for i, name in enumerate(names) if columns["CrossSection"][i] == xs_default or columns["NEvents"][i] == nevt_default]
+        if len(missing) > 0:
+            raise KeyError("ERROR MCSampleValuesHelper::The process(es) " + str(missing) + " have no cross section or number of events for " + str(energy) + "/" + str(year))
+        for key in self.__uncertainty_keys:
+            for info in ["Up", "Down"]:
+                columns[key+info] = self.get_values_array(key, energy, year, names, info)
+        return names, columns
+
+    def get_weight_variations(self, year, variations, lumi_target=1.0, energy=None, kFactor=False, Corrections=False, names=None):
+        """Return the normalisation weights of many MC processes (see get_weights) for many variations of their cross sections, branching ratios and k-factors
+
+        A variation shifts the values within their up/down uncertainties (see get_value): a shift s of a key replaces a value v
+        by v+s*Up for s>0 and by v+s*Down for s<0. The values are looked up once for all variations, e.g. for the
+        normalisation variations of a fit:
+            names, weights = helper.get_weight_variations("UL17", [{"CrossSection": +1}, {"CrossSection": -1}], 41480.0)
+
+        Args:
+            variations (:obj:`list` of :obj:`dict`): {key: shift} per variation, with the keys "CrossSection", "BranchingRatio" and
+              "kFactor" and the shift in units of the uncertainty, given for all processes (any real number, also a NumPy scalar)
+              or as a sequence with one shift per process. Keys which are not given are not shifted, None is the nominal weight.
+              A "kFactor" shift raises a ValueError unless kFactor is True.
+            lumi_target (`float`): The integrated luminosity in pb^-1 the processes are normalised to (1 gives 1/get_lumi)
+
+        With NumPy the weights are computed on views of the store columns (see get_values_array), one vector operation per key
+        and variation, otherwise process by process.
+
+        Returns:
+            (:obj:`list` of `str`, :obj:`list` of :obj:`array.array` of `float`): The processes and their weights per variation
+        """
+        import numbers
+        from array import array
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        names, columns = self.__normalisation_columns(year, energy, names)
+        keys = ["CrossSection", "BranchingRatio"] + (["kFactor"] if kFactor else [])
+        if np is not None:
+            columns = {key: np.frombuffer(column, dtype=np.float64) for key, column in columns.items()}
+            nominal = np.full(len(names), float(lumi_target))
+            if Corrections: nominal *= columns["Correction"]
+            nominal /= np.abs(columns["NEvents"])
+        else:
+            nominal = array("d", [lumi_target])*len(names)
+            for i in range(len(names)):
+                if Corrections: nominal[i] *= columns["Correction"][i]
+                nominal[i] /= abs(columns["NEvents"][i])
+        results = []
+        for variation in variations:
+            variation = {} if variation is None else variation
+            unknown = [key for key in variation if not key in self.__uncertainty_keys]
+            if len(unknown) > 0:
+                raise KeyError("ERROR MCSampleValuesHelper::No uncertainties for the key(s) " + str(unknown) + ", use one of " + str(self.__uncertainty_keys))
+            if "kFactor" in variation and not kFactor:
+                raise ValueError("ERROR MCSampleValuesHelper::A kFactor shift needs the k-factors in the weights (kFactor=True)")
+            weights = nominal.copy() if np is not None else array("d", nominal)
+            for key in keys:
+                shift = variation.get(key, 0.0)
+                scalar = isinstance(shift, numbers.Real) or (np is not None and np.ndim(shift) == 0)
+                if not scalar and len(shift) != len(names):
+                    raise ValueError("ERROR MCSampleValuesHelper::Got " + str(len(shift)) + " shifts of " + key + " for " + str(len(names)) + " processes")
+                values, up, down = columns[key], columns[key+"Up"], columns[key+"Down"]
+                if np is not None:
+                    shifts = np.asarray(shift, dtype=np.float64)
+                    weights *= values + shifts*np.where(shifts > 0, up, down)
+                    continue
+                shifts = [shift]*len(names) if scalar else shift
+                for i in range(len(names)):
+                    s = shifts[i]
+                    weights[i] *= values[i] + s*(up[i] if s > 0 else down[i])
+            results.append(array("d", weights.tobytes()) if np is not None else weights)
+        return names, results
+
+    def get_weights(self, year, lumi_target, energy=None, kFactor=False, Corrections=False, names=None, variation=None):
+        """Return the normalisation weights lumi_target*xs*br[*kfactor][*correction]/nevt = lumi_target/get_lumi of many MC processes
+
+        The weights are computed from the columns of the SampleValueStore (see get_values_array) in one pass instead of one
+        get_lumi call per process.
+
+        Args:
+            year (`str`): The production year, e.g. "UL17"
+            lumi_target (`float`): The integrated luminosity in pb^-1 the processes are normalised to, e.g. get_data_lumi("UL17")
+            energy (`str`): The simulated energy, the energy at which the year was taken (see get_years) if None
+            names (:obj:`list` of `str`): The processes, default: all MC processes with a cross section and a number of events
+            variation (:obj:`dict`): Shifts of the values within their uncertainties, e.g. {"CrossSection": +1} (see get_weight_variations)
+
+        Returns:
+            (:obj:`list` of `str`, :obj:`array.array` of `float`): The processes and their weights
+        """
+        names, weights = self.get_weight_variations(year, [variation], lumi_target, energy, kFactor, Corrections, names)
+        return names, weights[0]
+
+    def get_lumis(self, year, energy=None, kFactor=False, Corrections=False, names=None, variation=None):
+        """Return the luminosity equivalents (see get_lumi) of many MC processes, optionally shifted within their uncertainties (see get_weights)"""
+        from array import array
+        names, weights = self.get_weights(year, 1.0, energy, kFactor, Corrections, names, variation)
+        return names, array("d", [1.0/weight for weight in weights])
+
+    def get_normalisation_uncertainties(self, year, energy=None, kFactor=False, Corrections=False, names=None):
+        """Return the relative up and down uncertainties of the normalisation xs*br[*kfactor] of many MC processes
+
+        The relative uncertainties of the cross section, branching ratio (and k-factor) are added in quadrature, i.e. they are
+        treated as uncorrelated. The weights of the up/down variations are weight*(1+up) and weight*(1-down), the luminosity
+        equivalents lumi/(1+up) and lumi/(1-down).
+
+        Returns:
+            (:obj:`list` of `str`, :obj:`array.array` of `float`, :obj:`array.array` of `float`): The processes, up and down uncertainties
+        """
+        import math
+        from array import array
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        names, columns = self.__normalisation_columns(year, energy, names)
+        keys = ["CrossSection", "BranchingRatio"] + (["kFactor"] if kFactor else [])
+        if np is not None:
+            columns = {key: np.frombuffer(column, dtype=np.float64) for key, column in columns.items()}
+            up = np.sqrt(sum((columns[key+"Up"]/columns[key])**2 for key in keys))
+            down = np.sqrt(sum((columns[key+"Down"]/columns[key])**2 for key in keys))
+            return names, array("d", up.tobytes()), array("d", down.tobytes())
+        up, down = array("d", [0.0])*len(names), array("d", [0.0])*len(names)
+        for i in range(len(names)):
+            up[i] = math.sqrt(sum((columns[key+"Up"][i]/columns[key][i])**2 for key in keys))
+            down[i] = math.sqrt(sum((columns[key+"Down"][i]/columns[key][i])**2 for key in keys))
+        return names, up, down
+
+    def lumi_cache_info(self):
+        """Return the statistics of the get_lumi cache as a dictionary with the keys "hits", "misses" and "size"."""
+        return {"hits": self.__lumi_cache_hits, "misses": self.__lumi_cache_misses, "size": len(self.__lumi_cache)}
+
+    def clear_lumi_cache(self, reset_statistics=False):
+        """Drop all memoised get_lumi results. The hit/miss counters are kept unless reset_statistics is set."""
+        self.__lumi_cache.clear()
+        self.__lumi_cache_generation = self.__values_generation
+        if reset_statistics:
+            self.__lumi_cache_hits = 0
+            self.__lumi_cache_misses = 0
+
+class LookupProfiler():
+    """Collects call statistics for the lookup methods of the MCSampleValuesHelper
+
+    The profiler is only active if the environment variable CROSSSECTIONHELPER_PROFILE is set when this module is imported.
+    Its value is the path of the JSON file the statistics are written to when the interpreter exits ("1" writes to
+    CrossSectionHelper_profile.json in the current working directory). When the variable is not set the lookup methods are
+    left untouched, so there is no overhead at all.
+
+    For every method the number of calls and the cumulative (inclusive) time are recorded per (name, key) for get_value and per
+    name for its wrappers. In addition the number of lookups of unknown processes, the number of strict-mode misses (KeyError
+    raised with strict checking for a known process) and the number of lookups which fell back to the default value because no
+    value is stored are counted.
+    """
+
+    env_variable = "CROSSSECTIONHELPER_PROFILE"
+    default_output = "CrossSectionHelper_profile.json"
+    instrumented_methods = ["get_value", "get_xs", "get_nevt", "get_br", "get_kfactor", "get_corr", "get_xml", "get_lumi", "_MCSampleValuesHelper__fallback"]
+
+    def __init__(self):
+        self.calls = {}
+        self.strict_misses = 0
+        self.default_fallbacks = 0
+        self.unknown_processes = 0
+
+    def record(self, method, label, elapsed):
+        stats = self.calls.setdefault(method, {}).setdefault(label, [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+
+    def wrap(self, method_name, method):
+        import functools
+        import time
+        profiler = self
+
+        if method_name == "_MCSampleValuesHelper__fallback":
+            @functools.wraps(method)
+            def wrapper(self, name, key, default):
+                profiler.default_fallbacks += 1
+                return method(self, name, key, default)
+        elif method_name == "get_value":
+            @functools.wraps(method)
+            def wrapper(self, name, energy, year, key, strict=False, info=""):
+                start = time.perf_counter()
+                try:
+                    return method(self, name, energy, year, key, strict, info)
+                except KeyError:
+                    if not name in self.get_value_store().sample_ids: profiler.unknown_processes += 1
+                    else: profiler.strict_misses += 1
+                    raise
+                finally:
+                    profiler.record(method_name, name+"|"+key, time.perf_counter()-start)
+        else:
+            @functools.wraps(method)
+            def wrapper(self, name, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(self, name, *args, **kwargs)
+                finally:
+                    profiler.record(method_name, name, time.perf_counter()-start)
+        return wrapper
+
+    def install(self, cls):
+        """Replace the lookup methods of cls by instrumented versions"""
+        for method_name in self.instrumented_methods:
+            setattr(cls, method_name, self.wrap(method_name, cls.__dict__[method_name]))
+
+    def summary(self):
+        return {
+            "strict_misses": self.strict_misses,
+            "default_fallbacks": self.default_fallbacks,
+            "unknown_processes": self.unknown_processes,
+            "calls": {
+                method: {label: {"calls": stats[0], "time": stats[1]} for label, stats in sorted(labels.items())}
+                for method, labels in self.calls.items()
+            },
+        }
+
+    def dump(self, path):
+        import json
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def _install_profiler_from_environment():
+    output = os.environ.get(LookupProfiler.env_variable, "")
+    if output in ["", "0"]:
+        return None
+    if output == "1":
+        output = LookupProfiler.default_output
+    import atexit
+    profiler = LookupProfiler()
+    profiler.install(MCSampleValuesHelper)
+    atexit.register(profiler.dump, os.path.abspath(output))
+    return profiler
+
+lookup_profiler = _install_profiler_from_environment()
+
+
 def print_database(raise_errors=False):
     helper = MCSampleValuesHelper()
+    helper.load_lazy_shards()
     samples = list(MCSampleValuesHelper.__dict__["_MCSampleValuesHelper__values_dict"].keys())
     samples.sort()
     energies = MCSampleValuesHelper.__dict__["_MCSampleValuesHelper__energies"]
-    years = MCSampleValuesHelper.__dict__["_MCSampleValuesHelper__years"]
-    import re
-    run_pattern = re.compile("(?P<run>(Run)+[ABCDEFGH]{1})")
+    sample_info = helper.get_sample_info()
 
     max_sample_length = max(len(s) for s in samples)
     abspath_uhh2datasets = os.path.dirname(os.path.abspath(__file__))
@@ -7553,13 +8938,13 @@ def print_database(raise_errors=False):
 
     for energy in energies:
         banner(energy)
-        for year in years:
+        for year in MCSampleValuesHelper.get_years(energy):
             banner(year)
             for sample in samples:
-                run_match = run_pattern.search(sample)
-                isData = run_match is not None
+                isData = sample_info[sample].isData
                 nevt = helper.get_nevt(sample,energy,year)
-                lumi = "/" if (isData or nevt<0) else "%10.2g"%helper.get_lumi(sample,energy,year)
+                hasXS = helper.get_value(sample,energy,year,"CrossSection") != -1.0
+                lumi = "/" if (isData or nevt<0 or not hasXS) else "%10.2g"%helper.get_lumi(sample,energy,year)
                 nevt = "%10.2g"%nevt
                 line = '{sample: <{width}}-> nevt:{nevt: >5}, lumi:{lumi: >5}'.format(sample=sample, width=max_sample_length+3, nevt=nevt, lumi=lumi)
                 xmlpath = helper.get_xml(sample,energy,year)
@@ -7579,14 +8964,73 @@ def print_database(raise_errors=False):
     return 0
 
 
+def export_weights(output, years=None, lumi_targets=None, kFactor=False, Corrections=False, names=None):
+    """Write the normalisation weights (see MCSampleValuesHelper.get_weights) of all MC processes for several years to a file
+
+    The format is chosen by the extension of the output:
+        .json/.yaml/.yml: {"kFactor": false, "Corrections": false, "lumi": {year: lumi_target}, "weights": {year: {process: weight}}}
+                          (YAML requires PyYAML)
+        .root:            one TTree per year (named after the year) with the branches name and weight, and the
+                          lumi target and flags as JSON in the TObjString "metadata" (requires uproot and NumPy)
+
+    Args:
+        years (:obj:`list` of `str`): The years, default: all years with a known integrated luminosity of their run eras
+        lumi_targets (`float` or :obj:`dict` of `float`): The luminosity in pb^-1 for all years or per year, default: the sum
+          over the run eras of each year (see get_data_lumi)
+        names (:obj:`list` of `str`): The processes, default: all MC processes with a cross section and number of events
+
+    Returns:
+        :obj:`dict` of (:obj:`list` of `str`, :obj:`array.array` of `float`): The processes and weights per year
+    """
+    import json
+    helper = MCSampleValuesHelper()
+    if years is None:
+        years = [year for year in helper.get_years() if len(helper.get_eras(year)) > 0]
+    if not isinstance(lumi_targets, dict):
+        lumi_targets = {year: helper.get_data_lumi(year) if lumi_targets is None else float(lumi_targets) for year in years}
+    unknown = [year for year in years if not lumi_targets.get(year)]
+    if len(unknown) > 0:
+        raise KeyError("ERROR export_weights::No target luminosity for the year(s) " + str(unknown))
+    weights = {year: helper.get_weights(year, lumi_targets[year], kFactor=kFactor, Corrections=Corrections, names=names) for year in years}
+    metadata = {"kFactor": bool(kFactor), "Corrections": bool(Corrections), "lumi": {year: lumi_targets[year] for year in years}}
+
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".root":
+        import numpy as np
+        import uproot
+        with uproot.recreate(output) as f:
+            for year, (year_names, year_weights) in weights.items():
+                tree = f.mktree(year, {"name": "string", "weight": np.float64})
+                tree.extend({"name": np.array(year_names, dtype=object), "weight": np.frombuffer(year_weights, dtype=np.float64)})
+            f["metadata"] = json.dumps(metadata)
+    elif extension in [".json", ".yaml", ".yml"]:
+        content = dict(metadata, weights={year: dict(zip(year_names, year_weights)) for year, (year_names, year_weights) in weights.items()})
+        with open(output, "w") as f:
+            if extension == ".json":
+                json.dump(content, f, indent=2)
+            else:
+                import yaml
+                yaml.safe_dump(content, f, default_flow_style=False, sort_keys=False)
+    else:
+        raise ValueError("ERROR export_weights::Unknown output format \"" + extension + "\", use .json, .yaml or .root")
+    return weights
+
+
 if(__name__ == "__main__"):
     import argparse
     parser = argparse.ArgumentParser(description="CrossSectionHelper Database: find and calculate crucial information for your Analysis!")
 
     parser.add_argument("--print", action="store_true", help="print number of events and calculated luminosity of all samples in database (This is primarily to test the integrety of the database).")
     parser.add_argument("--throw", action="store_true", help="raise erros if they occur. Should be used together with --print option.")
+    parser.add_argument("--export-weights", metavar="OUTPUT", help="write the normalisation weights lumi*xs*br/nevt of all MC samples per year to a .json, .yaml or .root file.")
+    parser.add_argument("--years", nargs="+", help="years for --export-weights (default: all years with known data luminosity).")
+    parser.add_argument("--lumi", type=float, help="target luminosity in pb^-1 for --export-weights (default: the data luminosity of each year).")
+    parser.add_argument("--kFactor", action="store_true", help="include the k-factors in the weights of --export-weights.")
+    parser.add_argument("--Corrections", action="store_true", help="include the corrections in the weights of --export-weights.")
 
     args = parser.parse_args()
 
     if(args.print):
         print_database(args.throw)
+    if(args.export_weights):
+        export_weights(args.export_weights, args.years, args.lumi, args.kFactor, args.Corrections)
@@ -0,0 +1,1443 @@
+from collections import namedtuple
+import contextlib
+import heapq
+import os
+import re
+import tempfile
+
+
+campaigns = ["RunII_102X_v1", "RunII_102X_v2", "RunII_106X_v1", "RunII_106X_v2", "Run3_124X_v1"]
+repository_path = os.path.dirname(os.path.abspath(__file__))
+
+
+XMLEntry = namedtuple("XMLEntry", ["path", "line", "active"])
+Trailer = namedtuple("Trailer", ["entries", "method", "line"])
+
+in_pattern = re.compile(r'^\s*(?P<comment><!--[^<]*)?<In\s+FileName="(?P<path>[^"]*)"')
+trailer_pattern = re.compile(r'NumberEntries="(?P<entries>[-+0-9.eE]+)"\s+Method=(?P<method>\w+)')
+natural_pattern = re.compile(r"(\d+)")
+slashes_pattern = re.compile(r"(?<!:)/{2,}")
+number_pattern = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+def normalise_path(path):
+    """Collapse repeated slashes in a file path (the "//" of a "root://" URL is kept)"""
+    if "//" not in path:
+        return path
+    return slashes_pattern.sub("/", path)
+
+
+def natural_key(text):
+    """Sort key ordering the numbers in text numerically, e.g. Ntuple_2.root before Ntuple_10.root"""
+    parts = natural_pattern.split(text)
+    parts[1::2] = [int(p) for p in parts[1::2]]
+    return parts
+
+
+def canonical_key(path):
+    """Canonical sort key of an ntuple path: the directory (crab task, timestamp and block) followed by the natural order of the file name
+
+    All paths sharing a directory are contiguous in plain lexicographic order as well, which allows to canonicalise
+    lexicographically sorted fragments one directory at a time.
+    """
+    directory, filename = os.path.split(path)
+    return (directory, natural_key(filename))
+
+
+def parse_entries(text):
+    """Convert the value of a NumberEntries trailer to float, hand-written sums such as "583427+35987712" are added up"""
+    return sum(float(term) for term in number_pattern.findall(text))
+
+
+def parse_line(line):
+    """Parse a line of a dataset XML fragment
+
+    Returns:
+        An XMLEntry for `<In FileName=.../>` lines (active=False if the entry is commented out), a Trailer for
+        `NumberEntries` comments, None for anything else.
+    """
+    if line.startswith('<In FileName="'):
+        # Fast path for the plain active entries which make up almost all lines
+        return XMLEntry(line[14:line.index('"', 14)], line.rstrip("\n"), True)
+    match = in_pattern.match(line)
+    if match is not None:
+        return XMLEntry(match.group("path"), line.rstrip("\n"), match.group("comment") is None)
+    if "NumberEntries" in line:
+        match = trailer_pattern.search(line)
+        if match is not None:
+            return Trailer(parse_entries(match.group("entries")), match.group("method"), line.rstrip("\n"))
+    return None
+
+
+def iter_xml(path):
+    """Stream the parsed lines of a dataset XML fragment, yielding (parsed, line) pairs (see parse_line)"""
+    with open(path) as f:
+        for line in f:
+            yield parse_line(line), line.rstrip("\n")
+
+
+def read_trailers(path):
+    """Return the NumberEntries trailers of a fragment as a dictionary method -> entries
+
+    If a fragment carries several trailers of the same method (as hand-merged fragments do), the last one wins.
+    """
+    trailers = {}
+    for parsed, _ in iter_xml(path):
+        if isinstance(parsed, Trailer):
+            trailers[parsed.method] = parsed.entries
+    return trailers
+
+
+def format_entries(entries, method):
+    if float(entries).is_integer() and method == "fast":
+        return "%d" % entries
+    return "%f" % entries
+
+
+def format_trailer(entries, method):
+    return '<!-- < NumberEntries="%s" Method=%s /> -->' % (format_entries(entries, method), method)
+
+
+def with_path(entry, path):
+    """Return a copy of the entry pointing to path, keeping the remaining attributes of its line"""
+    if path == entry.path:
+        return entry
+    return XMLEntry(path, entry.line.replace('"'+entry.path+'"', '"'+path+'"', 1), entry.active)
+
+
+def is_directory_sorted(path):
+    """Check in a single streaming pass whether all entries sharing a directory are contiguous and in increasing directory order"""
+    previous = None
+    for parsed, _ in iter_xml(path):
+        if isinstance(parsed, XMLEntry):
+            directory = os.path.dirname(normalise_path(parsed.path))
+            if previous is not None and directory < previous:
+                return False
+            previous = directory
+    return True
+
+
+def iter_canonical_entries(path, directory_sorted=None):
+    """Yield the entries of a fragment with normalised paths in canonical order (see canonical_key)
+
+    Fragments sorted lexicographically or canonically, like all fragments in this repository, are streamed: only the entries
+    of one directory (at most a crab block of 1000 files) are held in memory. Other fragments are sorted in memory.
+    If directory_sorted is not given, it is determined with is_directory_sorted.
+    """
+    entries = (parsed for parsed, _ in iter_xml(path) if isinstance(parsed, XMLEntry))
+    if directory_sorted is None:
+        directory_sorted = is_directory_sorted(path)
+    return canonical_order(entries, directory_sorted)
+
+
+def canonical_order(entries, directory_sorted):
+    """Yield entries with normalised paths in canonical order, streamed one directory at a time if directory_sorted (see iter_canonical_entries)"""
+    entries = (with_path(entry, normalise_path(entry.path)) for entry in entries)
+    if not directory_sorted:
+        for entry in sorted(entries, key=lambda e: canonical_key(e.path)):
+            yield entry
+        return
+    group, directory = [], None
+    for entry in entries:
+        entry_directory = os.path.dirname(entry.path)
+        if entry_directory != directory:
+            group.sort(key=lambda e: natural_key(os.path.basename(e.path)))
+            for grouped in group:
+                yield grouped
+            group, directory = [], entry_directory
+        group.append(entry)
+    group.sort(key=lambda e: natural_key(os.path.basename(e.path)))
+    for grouped in group:
+        yield grouped
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """Open a temporary file next to path for writing, which replaces path only once the block finished without error"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix="."+os.path.basename(path)+".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            yield f
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        else:
+            os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def iter_canonical_lines(path):
+    """Yield the lines of the canonical form of a fragment
+
+    All lines which are no entries (header, trailers, comments, ...) stay in place. The runs of consecutive entries between them
+    are put in canonical order with normalised paths each on their own, so that e.g. the trailer of the first crab task of a
+    hand-merged fragment stays behind the entries of that task.
+    """
+    import itertools
+    # First pass: whether the entries of each run are directory sorted (see is_directory_sorted)
+    runs_sorted, previous = [], None
+    for parsed, _ in iter_xml(path):
+        if isinstance(parsed, XMLEntry):
+            directory = os.path.dirname(normalise_path(parsed.path))
+            if previous is None:
+                runs_sorted.append(True)
+            elif directory < previous:
+                runs_sorted[-1] = False
+            previous = directory
+        else:
+            previous = None
+    runs_sorted = iter(runs_sorted)
+    for is_entry, group in itertools.groupby(iter_xml(path), key=lambda parsed_line: isinstance(parsed_line[0], XMLEntry)):
+        if not is_entry:
+            for _, line in group:
+                yield line
+            continue
+        for entry in canonical_order((parsed for parsed, _ in group), next(runs_sorted)):
+            yield entry.line
+
+
+def canonicalise_xml(path, output=None, check_only=False):
+    """Rewrite a fragment in canonical form (see iter_canonical_lines)
+
+    The canonical form is compared to the fragment line by line while streaming, and the file is (atomically) rewritten only if
+    they differ.
+
+    Args:
+        path (`str`): The fragment to canonicalise
+        output (`str`): Where to write the canonical form, defaults to path (in-place)
+        check_only (`bool`): Do not write anything, only report whether the fragment is canonical
+
+    Returns:
+        `bool`: True if the fragment was not canonical
+    """
+    import itertools
+    with open(path) as f:
+        original = (line.rstrip("\n") for line in f)
+        changed = any(a != b for a, b in itertools.zip_longest(original, iter_canonical_lines(path)))
+    if check_only or (not changed and (output is None or os.path.abspath(output) == os.path.abspath(path))):
+        return changed
+    with atomic_write(output or path) as f:
+        for line in iter_canonical_lines(path):
+            f.write(line+"\n")
+    return changed
+
+
+@contextlib.contextmanager
+def git_revision_file(spec, repository=repository_path):
+    """Make the version of a file at a git revision available as a temporary file
+
+    Args:
+        spec (`str`): "<rev>:<path>", with path relative to the repository root (as for `git show`)
+    """
+    import shutil
+    import subprocess
+    fd, tmp_path = tempfile.mkstemp(suffix=".xml")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            process = subprocess.Popen(["git", "-C", repository, "show", spec], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            shutil.copyfileobj(process.stdout, f)
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                raise ValueError("Cannot read \"" + spec + "\" from git: " + stderr.decode().strip())
+        yield tmp_path
+    finally:
+        os.unlink(tmp_path)
+
+
+@contextlib.contextmanager
+def open_fragment(spec):
+    """Yield a local path for spec, which is either a file path or "<rev>:<path>" for a version in git history"""
+    if os.path.exists(spec) or ":" not in spec:
+        yield spec
+    else:
+        with git_revision_file(spec) as path:
+            yield path
+
+
+crab_task_pattern = re.compile(r"^(?P<task>.*?/crab_[^/]*)/")
+
+
+def crab_task(path):
+    """Return the path up to the crab task directory (or the directory of path if it does not follow the crab layout)"""
+    match = crab_task_pattern.match(path)
+    return match.group("task") if match is not None else os.path.dirname(path)
+
+
+def diff_xmls(old, new):
+    """Compare two fragments in a single merge pass over their canonical entry streams
+
+    Only active entries are compared (commenting out an entry counts as removing it). An added file is counted as moved if a
+    removed file has the same crab task name and file name, i.e. only its storage location, timestamp or block changed.
+
+    Args:
+        old, new (`str`): The fragments to compare, see open_fragment for the accepted forms
+
+    Returns:
+        :obj:`dict`: with the keys "added", "removed", "moved", "unchanged" (counts), "tasks" ({crab task: {"added": n,
+        "removed": n}}) and "trailers" ({method: (old entries, new entries)})
+    """
+    result = {"added": 0, "removed": 0, "moved": 0, "unchanged": 0, "tasks": {}, "trailers": {}}
+    removed_names, added_names = {}, {}
+
+    def task_stats(path):
+        return result["tasks"].setdefault(crab_task(path), {"added": 0, "removed": 0})
+
+    def moved_key(path):
+        return (os.path.basename(crab_task(path)), os.path.basename(path))
+
+    with open_fragment(old) as old_path, open_fragment(new) as new_path:
+        old_entries = (e for e in iter_canonical_entries(old_path) if e.active)
+        new_entries = (e for e in iter_canonical_entries(new_path) if e.active)
+        old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+        while old_entry is not None or new_entry is not None:
+            if new_entry is None or (old_entry is not None and canonical_key(old_entry.path) < canonical_key(new_entry.path)):
+                result["removed"] += 1
+                task_stats(old_entry.path)["removed"] += 1
+                key = moved_key(old_entry.path)
+                removed_names[key] = removed_names.get(key, 0) + 1
+                old_entry = next(old_entries, None)
+            elif old_entry is None or canonical_key(new_entry.path) < canonical_key(old_entry.path):
+                result["added"] += 1
+                task_stats(new_entry.path)["added"] += 1
+                key = moved_key(new_entry.path)
+                added_names[key] = added_names.get(key, 0) + 1
+                new_entry = next(new_entries, None)
+            else:
+                result["unchanged"] += 1
+                old_entry, new_entry = next(old_entries, None), next(new_entries, None)
+        old_trailers, new_trailers = read_trailers(old_path), read_trailers(new_path)
+
+    result["moved"] = sum(min(n, removed_names.get(key, 0)) for key, n in added_names.items())
+    for method in sorted(set(old_trailers) | set(new_trailers)):
+        result["trailers"][method] = (old_trailers.get(method), new_trailers.get(method))
+    return result
+
+
+timestamp_pattern = re.compile(r"^\d{6}_\d{6}$")
+skipped_directories = ["failed", "log"]
+
+
+# All accesses to the storage go through storage_path, list_directory and stat_file. The prefix map redirects storage paths
+# (e.g. /pnfs/desy.de/...) to another location and the latency is added to every directory listing and stat call, which allows
+# to run the tools on a local copy or emulation of the storage (see StorageEmulator.py). Both can be set with
+# configure_storage or through the environment variables below, which are also seen by worker processes.
+storage_prefix_map_variable = "UHH2_DATASETS_PREFIX_MAP"
+storage_latency_variable = "UHH2_DATASETS_STORAGE_LATENCY"
+storage_prefix_map = []
+storage_latency = 0.0
+
+
+def configure_storage(prefix_map=None, latency=None):
+    """Set the storage path remapping ({storage prefix: local prefix}) and the simulated latency per access in seconds"""
+    global storage_prefix_map, storage_latency
+    if prefix_map is not None:
+        storage_prefix_map = sorted(prefix_map.items(), key=lambda item: -len(item[0]))
+        os.environ[storage_prefix_map_variable] = ";".join(k+"="+v for k, v in storage_prefix_map)
+    if latency is not None:
+        storage_latency = float(latency)
+        os.environ[storage_latency_variable] = str(storage_latency)
+
+
+def configure_storage_from_environment():
+    prefix_map = os.environ.get(storage_prefix_map_variable, "")
+    configure_storage(dict(item.split("=", 1) for item in prefix_map.split(";") if "=" in item), os.environ.get(storage_latency_variable, "0"))
+
+
+def storage_path(path):
+    """Return the location to access for a storage path, applying the prefix map"""
+    for prefix, replacement in storage_prefix_map:
+        if path.startswith(prefix):
+            return replacement + path[len(prefix):]
+    return path
+
+
+def list_directory(path):
+    """Return the lists (subdirectories, files) of a directory, as full storage paths"""
+    import time
+    if storage_latency > 0: time.sleep(storage_latency)
+    subdirectories, files = [], []
+    with os.scandir(storage_path(path)) as it:
+        for entry in it:
+            if entry.is_dir():
+                subdirectories.append(os.path.join(path, entry.name))
+            else:
+                files.append(os.path.join(path, entry.name))
+    return subdirectories, files
+
+
+def stat_file(path):
+    """Return os.stat of a storage path"""
+    import time
+    if storage_latency > 0: time.sleep(storage_latency)
+    return os.stat(storage_path(path))
+
+
+def find_ntuples(roots, file_pattern="Ntuple_*.root", workers=16, all_timestamps=False):
+    """Walk crab output trees in parallel and return the paths of all ntuples, in canonical order
+
+    Every directory is listed by its own task in a thread pool, so that the latency of the storage system is paid
+    concurrently rather than once per directory. "failed" and "log" directories written by crab are skipped. If a crab task
+    directory contains several submission timestamps (e.g. after a resubmission) only the latest one is used, unless
+    all_timestamps is set.
+
+    Args:
+        roots (:obj:`list` of `str`): crab task directories, or directories containing them
+        file_pattern (`str`): shell-style pattern of the file names to collect
+        workers (`int`): number of concurrent directory listings
+    """
+    import concurrent.futures
+    import fnmatch
+    ntuples = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set(pool.submit(list_directory, root) for root in roots)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                subdirectories, files = future.result()
+                ntuples.extend(f for f in files if fnmatch.fnmatchcase(os.path.basename(f), file_pattern))
+                timestamps = sorted(d for d in subdirectories if timestamp_pattern.match(os.path.basename(d)))
+                if not all_timestamps and len(timestamps) > 1:
+                    subdirectories = [d for d in subdirectories if d not in timestamps[:-1]]
+                for subdirectory in subdirectories:
+                    if os.path.basename(subdirectory) not in skipped_directories:
+                        pending.add(pool.submit(list_directory, subdirectory))
+    ntuples = [normalise_path(path) for path in ntuples]
+    ntuples.sort(key=canonical_key)
+    return ntuples
+
+
+def count_entries(path, tree="AnalysisTree"):
+    """Return the number of entries of the tree in a ROOT file (requires uproot)"""
+    import time
+    import uproot
+    if storage_latency > 0: time.sleep(storage_latency)
+    with uproot.open(storage_path(path)) as f:
+        return f[tree].num_entries
+
+
+class FileInfoCache():
+    """Persistent per-file information, stored as JSON {path: {key: value}}
+
+    The keys in use are "size" (bytes) and the NumberEntries methods, e.g. "fast" (number of entries), so the cache can be
+    passed directly as file_entries to merge_xmls.
+
+    Args:
+        path (`str`): Location of the cache file, defaults to ~/.cache/UHH2-datasets/file_info.json
+    """
+
+    default_path = os.path.join(os.path.expanduser("~"), ".cache", "UHH2-datasets", "file_info.json")
+
+    def __init__(self, path=None):
+        import json
+        self.path = path or self.default_path
+        self.__info = {}
+        self.__modified = False
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.__info = json.load(f)
+
+    def get(self, path, key, default=None):
+        return self.__info.get(path, {}).get(key, default)
+
+    def set(self, path, key, value):
+        self.__info.setdefault(path, {})[key] = value
+        self.__modified = True
+
+    def as_dict(self):
+        return self.__info
+
+    def save(self):
+        import json
+        if not self.__modified:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump(self.__info, f)
+        self.__modified = False
+
+
+def file_sizes(paths, cache=None, workers=32, refresh=False):
+    """Return {path: size in bytes} for the given storage paths, missing files are reported with size None
+
+    Sizes found in the cache are reused (unless refresh is set), all others are determined with concurrent stat calls and
+    added to the cache.
+    """
+    import concurrent.futures
+    sizes = {}
+    todo = []
+    for path in paths:
+        size = cache.get(path, "size") if (cache is not None and not refresh) else None
+        if size is None:
+            todo.append(path)
+        else:
+            sizes[path] = size
+
+    def size_or_none(path):
+        try:
+            return stat_file(path).st_size
+        except OSError:
+            return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, size in zip(todo, pool.map(size_or_none, todo)):
+            sizes[path] = size
+            if cache is not None and size is not None:
+                cache.set(path, "size", size)
+    return sizes
+
+
+def branch_fraction(paths, branches, tree="AnalysisTree"):
+    """Return the fraction of the file size taken by the (compressed) baskets of the selected branches (requires uproot)
+
+    Args:
+        paths (:obj:`list` of `str`): Sample of files to inspect
+        branches (:obj:`list` of `str`): Branch names, shell-style wildcards are supported, see selected_bytes
+    """
+    import uproot
+    selected, total = 0, 0
+    for path in paths:
+        with uproot.open(storage_path(path)) as f:
+            selected += selected_bytes(f[tree].branches, branches)
+            total += stat_file(path).st_size
+    return float(selected)/total if total > 0 else 0.0
+
+
+def selected_bytes(tree_branches, branches, selected=False):
+    """Return the compressed bytes of the selected branches, including all their sub-branches
+
+    The baskets of a split object (e.g. jetsAk4Puppi) are in its sub-branches (jetsAk4Puppi.m_pt, ...), so a branch is read
+    if its name or the name of one of its parents matches one of the shell-style patterns in branches.
+
+    Args:
+        tree_branches (:obj:`list`): The branches of a tree (uproot TBranch objects with name, compressed_bytes and branches)
+        selected (`bool`): Whether the parent of tree_branches is selected
+    """
+    import fnmatch
+    total = 0
+    for branch in tree_branches:
+        matched = selected or any(fnmatch.fnmatchcase(branch.name, b) for b in branches)
+        if matched:
+            total += branch.compressed_bytes
+        total += selected_bytes(branch.branches, branches, matched)
+    return total
+
+
+def active_paths(xml_path):
+    return [normalise_path(parsed.path) for parsed, _ in iter_xml(xml_path) if isinstance(parsed, XMLEntry) and parsed.active]
+
+
+def xml_sizes(xml_paths, cache=None, workers=32, refresh=False, branches=None, sample=3):
+    """Sum up the sizes of the files listed in XML fragments
+
+    Args:
+        xml_paths (:obj:`list` of `str`): The fragments
+        branches (:obj:`list` of `str`): If given, the expected read volume for these branches is estimated from the branch
+            sizes in `sample` files per fragment
+    Returns:
+        :obj:`dict`: {xml: {"files": n, "missing": n, "bytes": n[, "read_bytes": n]}}
+    """
+    report = {}
+    for xml_path in xml_paths:
+        paths = active_paths(xml_path)
+        sizes = file_sizes(paths, cache, workers, refresh)
+        found = [p for p in paths if sizes[p] is not None]
+        stats = {"files": len(paths), "missing": len(paths)-len(found), "bytes": sum(sizes[p] for p in found)}
+        if branches:
+            sampled = found[:: max(1, len(found)//sample)][:sample] if len(found) > 0 else []
+            stats["read_bytes"] = int(stats["bytes"]*branch_fraction(sampled, branches)) if sampled else 0
+        report[xml_path] = stats
+    if cache is not None:
+        cache.save()
+    return report
+
+
+def format_bytes(n):
+    for unit in ["B", "kB", "MB", "GB", "TB"]:
+        if abs(n) < 1000 or unit == "TB":
+            return "%.1f %s" % (n, unit)
+        n /= 1000.0
+
+
+split_modes = ["files", "bytes", "events"]
+
+
+def partition_lpt(weights, n_parts):
+    """Distribute items with the given weights over n_parts bins of similar total weight (longest processing time first)
+
+    Returns:
+        :obj:`list` of :obj:`list` of `int`: The item indices of each bin
+    """
+    parts = [[] for _ in range(n_parts)]
+    heap = [(0.0, i) for i in range(n_parts)]
+    for item in sorted(range(len(weights)), key=lambda i: -weights[i]):
+        total, part = heapq.heappop(heap)
+        parts[part].append(item)
+        heapq.heappush(heap, (total+weights[item], part))
+    return parts
+
+
+def split_xml(xml_path, output_directory, n_jobs=None, max_per_job=None, mode="bytes", cache=None, workers=32):
+    """Split the files of an XML fragment into several fragments, one per batch job
+
+    In "files" mode the fragment is cut into contiguous pieces with the same number of files. In "bytes" and "events" mode
+    the files are distributed with the LPT heuristic such that every job reads a similar number of bytes or events. The sizes
+    are taken from the cache or determined with stat calls, the numbers of events have to be in the cache (key "fast", see
+    the "check" command); files with unknown weight are counted with the average weight. Each output fragment lists its files
+    in canonical order and carries a NumberEntries trailer if the numbers of events of all its files are known.
+
+    Args:
+        xml_path (`str`): The fragment to split
+        output_directory (`str`): Where to write the fragments <name>_<i>.xml
+        n_jobs (`int`): The number of fragments to create
+        max_per_job (`float`): Alternatively to n_jobs, the maximum number of files, bytes or events per job
+        mode (`str`): One of "files", "bytes" or "events"
+        cache (FileInfoCache): Per-file sizes and numbers of events
+
+    Returns:
+        :obj:`list` of `tuple`: (fragment path, number of files, total weight) for every fragment written
+    """
+    import math
+    if mode not in split_modes:
+        raise ValueError("Unknown split mode \"" + str(mode) + "\", use one of " + str(split_modes))
+    paths = active_paths(xml_path)
+    if mode == "bytes":
+        known = file_sizes(paths, cache, workers)
+        if cache is not None: cache.save()
+    elif mode == "events":
+        known = {p: (cache.get(p, "fast") if cache is not None else None) for p in paths}
+    else:
+        known = {p: 1 for p in paths}
+    values = [v for v in known.values() if v is not None]
+    average = float(sum(values))/len(values) if len(values) > 0 else 1.0
+    weights = [known[p] if known[p] is not None else average for p in paths]
+
+    if n_jobs is None:
+        if max_per_job is None:
+            raise ValueError("Either the number of jobs or the maximum per job has to be given")
+        n_jobs = int(math.ceil(sum(weights)/float(max_per_job)))
+    n_jobs = max(1, min(n_jobs, len(paths)))
+    if mode == "files":
+        bounds = [len(paths)*i//n_jobs for i in range(n_jobs+1)]
+        parts = [list(range(bounds[i], bounds[i+1])) for i in range(n_jobs)]
+    else:
+        parts = partition_lpt(weights, n_jobs)
+
+    os.makedirs(output_directory, exist_ok=True)
+    name = os.path.splitext(os.path.basename(xml_path))[0]
+    written = []
+    for i, part in enumerate(parts):
+        part_paths = sorted((paths[j] for j in part), key=canonical_key)
+        entries = [cache.get(p, "fast") if cache is not None else None for p in part_paths]
+        trailers = {"fast": sum(entries)} if all(e is not None for e in entries) and len(entries) > 0 else None
+        output = os.path.join(output_directory, "%s_%d.xml" % (name, i))
+        write_xml(output, part_paths, trailers)
+        written.append((output, len(part_paths), sum(weights[j] for j in part)))
+    return written
+
+
+def check_file(path, tree="AnalysisTree"):
+    """Open a ROOT file and check that the tree exists and is not empty (requires uproot)
+
+    Returns:
+        `tuple`: (path, number of entries or None, problem) with problem one of None, "EMPTY" or "BAD: <reason>"
+    """
+    try:
+        entries = count_entries(path, tree)
+    except Exception as error:
+        return path, None, "BAD: %s: %s" % (type(error).__name__, str(error).split("\n")[0])
+    return path, entries, ("EMPTY" if entries == 0 else None)
+
+
+def check_xml(xml_path, cleaned=None, cache=None, workers=None, tree="AnalysisTree"):
+    """Check all files listed in an XML fragment in a process pool, see check_file
+
+    The numbers of entries of the readable files are stored in the cache (key "fast"). If cleaned is given, a copy of the
+    fragment is written there in which the problematic files are commented out, following the convention of this repository
+    (`<!--EMPTY <In .../> -->` for empty files, `<!-- BAD <In .../> -->` otherwise), with a recomputed NumberEntries trailer.
+    Trailers of other methods are only kept if no file was commented out.
+
+    Returns:
+        :obj:`dict`: {path: problem} for the problematic files
+    """
+    import concurrent.futures
+    import functools
+    paths = active_paths(xml_path)
+    problems, total = {}, 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, entries, problem in pool.map(functools.partial(check_file, tree=tree), paths, chunksize=16):
+            if entries is not None:
+                total += entries
+                if cache is not None: cache.set(path, "fast", entries)
+            if problem is not None:
+                problems[path] = problem
+    if cache is not None:
+        cache.save()
+
+    if cleaned is not None:
+        with atomic_write(cleaned) as f:
+            for parsed, line in iter_xml(xml_path):
+                if isinstance(parsed, XMLEntry) and parsed.active and normalise_path(parsed.path) in problems:
+                    problem = problems[normalise_path(parsed.path)]
+                    line = ("<!--EMPTY " if problem == "EMPTY" else "<!-- BAD ") + line.strip() + " -->"
+                elif isinstance(parsed, Trailer) and (parsed.method == "fast" or len(problems) > 0):
+                    continue
+                f.write(line+"\n")
+            f.write(format_trailer(total, "fast")+"\n")
+    return problems
+
+
+entry_line_pattern = re.compile(r'^\s*(<!--\s*\w*\s*)?<In\s+FileName="[^"]+"\s+Lumi="[-+0-9.eE]+"\s*/>\s*(-->)?\s*$')
+comment_line_pattern = re.compile(r"^\s*<!--.*-->\s*$")
+
+
+def validate_xml(xml_path):
+    """Check the syntax of a fragment and the presence of a NumberEntries trailer
+
+    Returns:
+        :obj:`list` of `str`: The problems found
+    """
+    problems = []
+    has_trailer = False
+    for number, (parsed, line) in enumerate(iter_xml(xml_path), 1):
+        if isinstance(parsed, Trailer):
+            has_trailer = True
+        elif isinstance(parsed, XMLEntry):
+            if entry_line_pattern.match(line) is None:
+                problems.append("line %d: malformed entry: %s" % (number, line.strip()))
+        elif line.strip() != "" and comment_line_pattern.match(line) is None:
+            problems.append("line %d: cannot parse: %s" % (number, line.strip()))
+    if not has_trailer:
+        problems.append("no NumberEntries trailer")
+    return problems
+
+
+def git_output(*args):
+    import subprocess
+    return subprocess.check_output(["git", "-C", repository_path] + list(args)).decode()
+
+
+def load_values_dict(source, name="CrossSectionHelper"):
+    """Execute the source of a version of CrossSectionHelper.py and return its __values_dict"""
+    namespace = {"__name__": name+"_validation"}
+    exec(compile(source, name+".py", "exec"), namespace)
+    return namespace["MCSampleValuesHelper"].__dict__["_MCSampleValuesHelper__values_dict"]
+
+
+def load_shard_samples(path, revision=None):
+    """Return the "samples" of a JSON shard at a git revision (default: the working tree), {} if it doesn't exist there"""
+    import json
+    if revision is None:
+        if not os.path.exists(os.path.join(repository_path, path)):
+            return {}
+        with open(os.path.join(repository_path, path)) as f:
+            return json.load(f).get("samples", {})
+    if git_output("ls-tree", "--name-only", revision, "--", path).strip() == "":
+        return {}
+    return json.loads(git_output("show", revision+":"+path)).get("samples", {})
+
+
+def validate_changes(base="origin/master", nevt_tolerance=1e-3):
+    """Validate only what changed in the working tree with respect to the merge base of base and HEAD
+
+    The working tree is validated as it is, including uncommitted, deleted and untracked files. Changed XML fragments are
+    parsed and checked for a NumberEntries trailer (see validate_xml). For all changed entries of the __values_dict, and for
+    all entries referring to a changed or deleted fragment, the referenced XML files have to exist and their number of events
+    should match one of the NumberEntries trailers of the fragment (within nevt_tolerance).
+
+    The __values_dict of both versions of CrossSectionHelper.py is compared without the shards, the samples of changed JSON
+    shards are compared per shard. If the base version of CrossSectionHelper.py cannot be executed, a warning is given and all
+    its samples are checked.
+
+    Returns:
+        `tuple`: (errors, warnings, timing), with timing a list of (stage, seconds)
+    """
+    import math
+    import time
+    from CrossSectionHelper import MCSampleValuesHelper
+    errors, warnings, timing = [], [], []
+    start = time.perf_counter()
+
+    def stage(name):
+        nonlocal start
+        now = time.perf_counter()
+        timing.append((name, now-start))
+        start = now
+
+    merge_base = git_output("merge-base", base, "HEAD").strip()
+    changed_files = [f for f in (git_output("diff", "--name-only", merge_base) + git_output("ls-files", "--others", "--exclude-standard")).split("\n") if f != ""]
+    changed_xmls = [f for f in changed_files if f.endswith(".xml")]
+    stage("git diff (%d changed files, %d XMLs)" % (len(changed_files), len(changed_xmls)))
+
+    for xml in changed_xmls:
+        if os.path.exists(os.path.join(repository_path, xml)):
+            errors.extend(xml + ": " + problem for problem in validate_xml(os.path.join(repository_path, xml)))
+    stage("XML syntax and trailers")
+
+    changed_samples = set()
+    for shard in changed_files:
+        if shard.endswith(".json"):
+            old_samples, new_samples = load_shard_samples(shard, merge_base), load_shard_samples(shard)
+            changed_samples |= set(s for s in new_samples if old_samples.get(s) != new_samples[s])
+    if "CrossSectionHelper.py" in changed_files:
+        with open(os.path.join(repository_path, "CrossSectionHelper.py")) as f:
+            new_values = load_values_dict(f.read())
+        try:
+            old_values = load_values_dict(git_output("show", merge_base+":CrossSectionHelper.py"))
+        except Exception as error:
+            warnings.append("CrossSectionHelper.py of %s cannot be executed (%s: %s), all of its samples are checked" % (merge_base[:12], type(error).__name__, error))
+            old_values = {}
+        changed_samples |= set(s for s in new_values if old_values.get(s) != new_values[s])
+    helper = MCSampleValuesHelper()
+    helper.load_lazy_shards()
+    changed_xml_set = set(changed_xmls)
+    for sample, values in MCSampleValuesHelper.__dict__["_MCSampleValuesHelper__values_dict"].items():
+        if "XMLname" in values and any(x in changed_xml_set for x in values["XMLname"]):
+            changed_samples.add(sample)
+    stage("changed database entries (%d samples)" % len(changed_samples))
+
+    for sample in sorted(changed_samples):
+        for energy in MCSampleValuesHelper.get_periods()[1]:
+            for year in MCSampleValuesHelper.get_years(energy):
+                xml = helper.get_xml(sample, energy, year)
+                if xml == "":
+                    continue
+                xml_path = os.path.join(repository_path, xml)
+                if not os.path.isfile(xml_path):
+                    errors.append("%s (%s): XML not found: %s" % (sample, year, xml))
+                    continue
+                nevt = helper.get_nevt(sample, energy, year)
+                trailers = read_trailers(xml_path)
+                if nevt >= 0 and len(trailers) > 0 and not any(math.isclose(abs(v), abs(nevt), rel_tol=nevt_tolerance) for v in trailers.values()):
+                    warnings.append("%s (%s): NEVT=%s does not match the NumberEntries trailers %s of %s" % (sample, year, nevt, trailers, xml))
+    stage("XML paths and NEVT consistency")
+    return errors, warnings, timing
+
+
+def write_xml(output, paths, trailers=None, problems=None):
+    """Write a fragment listing paths, followed by the NumberEntries trailers ({method: entries}) if given
+
+    Paths with a problem ({path: problem}, see check_file) are written commented out, as `<!--EMPTY <In .../> -->` for empty
+    files and `<!-- BAD <In .../> -->` otherwise.
+    """
+    problems = problems or {}
+    with atomic_write(output) as f:
+        for path in paths:
+            line = '<In FileName="%s" Lumi="0.0"/>' % path
+            if path in problems:
+                line = ("<!--EMPTY " if problems[path] == "EMPTY" else "<!-- BAD ") + line + " -->"
+            f.write(line+"\n")
+        for method, entries in (trailers or {}).items():
+            f.write(format_trailer(entries, method)+"\n")
+
+
+def generate_xml(roots, output, count=False, workers=16, all_timestamps=False):
+    """Create a fragment from crab output trees, see find_ntuples. With count, a NumberEntries trailer (Method=fast) is added.
+
+    With count all ntuples are opened (see check_file). Unreadable and empty ntuples are written commented out (see write_xml)
+    and do not contribute to the trailer.
+
+    Returns:
+        (:obj:`list`, :obj:`dict`): The ntuple paths written and {path: problem} for the problematic ntuples
+    """
+    ntuples = find_ntuples(roots, workers=workers, all_timestamps=all_timestamps)
+    trailers, problems = None, {}
+    if count:
+        import concurrent.futures
+        total = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            for path, entries, problem in pool.map(check_file, ntuples):
+                total += entries or 0
+                if problem is not None:
+                    problems[path] = problem
+        trailers = {"fast": total}
+    write_xml(output, ntuples, trailers, problems)
+    return ntuples, problems
+
+
+def register_xml(sample, year, xml, source=None, helper_path=os.path.join(repository_path, "CrossSectionHelper.py")):
+    """Set the XML (and optionally the DAS source) of a sample for a year in the __values_dict of CrossSectionHelper.py
+
+    The source file is edited in place at the positions found by parsing it, so its formatting is kept. An existing
+    Xml_<year> (XmlSource_<year>) value is replaced, otherwise the field (or the whole XMLname tuple) is added.
+    For the years of a lazily loaded shard (e.g. 2022) the sample is edited in the shard instead, see register_shard_xml.
+
+    Args:
+        sample (`str`): The process name, which has to exist in the __values_dict (or the shard) already
+        year (`str`): The year (or energy) of the field
+        xml (`str`): The path of the XML fragment, relative to the repository root
+        source (`str`): The DAS name of the dataset
+    """
+    import ast
+    from CrossSectionHelper import MCSampleValuesHelper
+    MCSampleValuesHelper().load_lazy_shards()
+    if "Xml_"+year not in MCSampleValuesHelper.XMLValues._fields:
+        raise ValueError("ERROR register_xml::Unknown year \"" + str(year) + "\"")
+    for shard, periods in MCSampleValuesHelper.get_lazy_shards().items():
+        if year in periods:
+            if shard == os.path.relpath(legacy_shard_path, repository_path):
+                raise ValueError("ERROR register_xml::The values of \"" + str(year) + "\" are in the shard " + shard + ", which is generated by import-legacy: add the XML fragment to the legacy campaign and rerun import-legacy instead")
+            return register_shard_xml(sample, year, xml, source, os.path.join(os.path.dirname(os.path.abspath(helper_path)), shard))
+    with open(helper_path) as f:
+        text = f.read()
+    lines = text.split("\n")
+    module = ast.parse(text)
+    helper_class = next(n for n in module.body if isinstance(n, ast.ClassDef) and n.name == "MCSampleValuesHelper")
+    values_dict = next(n.value for n in helper_class.body if isinstance(n, ast.Assign) and any(getattr(t, "id", None) == "__values_dict" for t in n.targets))
+    sample_dict = next((v for k, v in zip(values_dict.keys, values_dict.values) if getattr(k, "value", None) == sample), None)
+    if sample_dict is None:
+        raise KeyError("ERROR register_xml::Unknown process \"" + str(sample) + "\" in " + helper_path)
+    xml_call = next((v for k, v in zip(sample_dict.keys, sample_dict.values) if getattr(k, "value", None) == "XMLname"), None)
+
+    def insertion_point(node):
+        # Position right after node and its trailing comma, and the prefix needed if there is no trailing comma
+        end_line, end_col = node.end_lineno, node.end_col_offset
+        if lines[end_line-1][end_col:].lstrip().startswith(","):
+            return end_line, lines[end_line-1].index(",", end_col)+1, ""
+        return end_line, end_col, ","
+
+    # Edits are (line, column, end line, end column, replacement), applied from the end of the file to keep positions valid
+    edits = []
+    fields = [("Xml_"+year, xml)] + ([("XmlSource_"+year, source)] if source is not None else [])
+    if xml_call is None:
+        end_line, end_col, prefix = insertion_point(sample_dict.values[-1])
+        indent = " "*sample_dict.keys[-1].col_offset
+        block = [indent + '"XMLname" : XMLValues(', indent + "    " + ", ".join('%s="%s"' % f for f in fields) + ",", indent + "),"]
+        edits.append((end_line, end_col, end_line, end_col, prefix + "\n" + "\n".join(block)))
+    else:
+        keywords = {kw.arg: kw for kw in xml_call.keywords}
+        missing = []
+        for field, value in fields:
+            if field in keywords:
+                node = keywords[field].value
+                edits.append((node.lineno, node.col_offset, node.end_lineno, node.end_col_offset, '"%s"' % value))
+            else:
+                missing.append('%s="%s"' % (field, value))
+        if len(missing) > 0:
+            if "Xml_"+year in keywords:
+                # Only the source is missing: append it right after the XML path
+                node = keywords["Xml_"+year].value
+                edits.append((node.end_lineno, node.end_col_offset, node.end_lineno, node.end_col_offset, ", " + ", ".join(missing)))
+            elif len(xml_call.keywords) > 0:
+                last = xml_call.keywords[-1]
+                end_line, end_col, prefix = insertion_point(last.value)
+                edits.append((end_line, end_col, end_line, end_col, prefix + "\n" + " "*xml_call.keywords[0].col_offset + ", ".join(missing) + ","))
+            else:
+                end_line, end_col = xml_call.end_lineno, xml_call.end_col_offset-1
+                edits.append((end_line, end_col, end_line, end_col, ", ".join(missing)))
+
+    for line, col, end_line, end_col, replacement in sorted(edits, reverse=True):
+        lines[line-1:end_line] = (lines[line-1][:col] + replacement + lines[end_line-1][end_col:]).split("\n")
+    text = "\n".join(lines)
+    ast.parse(text)
+    with atomic_write(helper_path) as f:
+        f.write(text)
+
+
+def register_shard_xml(sample, year, xml, source, shard_path):
+    """Set the XML (and optionally the DAS source) of a sample for a year in a JSON shard (see MCSampleValuesHelper.load_shard)
+
+    The shard is rewritten with its indentation kept. Generated shards (see import_legacy) should not be edited this way.
+    """
+    import json
+    with open(shard_path) as f:
+        text = f.read()
+    shard = json.loads(text)
+    if not sample in shard.get("samples", {}):
+        raise KeyError("ERROR register_xml::Unknown process \"" + str(sample) + "\" in " + shard_path)
+    fields = shard["samples"][sample].setdefault("XMLname", {})
+    fields["Xml_"+year] = xml
+    if source is not None:
+        fields["XmlSource_"+year] = source
+    second_line = text.split("\n")[1] if "\n" in text else ""
+    with atomic_write(shard_path) as f:
+        json.dump(shard, f, indent=len(second_line)-len(second_line.lstrip(" ")) or 2)
+        f.write("\n")
+
+
+def merge_xmls(inputs, output, file_entries=None):
+    """Merge several dataset XML fragments into one, streaming all inputs at once (k-way merge in canonical order)
+
+    Identical paths (after normalisation) are written only once; an active entry wins over commented-out ones. The
+    NumberEntries trailers of the inputs are added up per method if every input carries that method. If duplicates were
+    dropped, the sum is corrected with the per-file counts in file_entries; methods for which a dropped file has no known
+    count are left out, since their total would be wrong.
+
+    Args:
+        inputs (:obj:`list` of `str`): Paths of the fragments to merge
+        output (`str`): Path of the merged fragment, written atomically
+        file_entries (:obj:`dict`): Optional per-file counts, {path: {method: entries}}
+
+    Returns:
+        :obj:`dict`: Statistics with the keys "entries", "duplicates" and "trailers" (method -> entries written)
+    """
+    file_entries = file_entries or {}
+    trailers = [read_trailers(path) for path in inputs]
+    methods = [m for m in trailers[0] if all(m in t for t in trailers)] if len(trailers) > 0 else []
+    totals = {m: sum(t[m] for t in trailers) for m in methods}
+
+    n_entries, n_duplicates = 0, 0
+    streams = [iter_canonical_entries(path) for path in inputs]
+    with atomic_write(output) as f:
+        run_key, run = None, []
+
+        def flush(run):
+            # All entries of a run share the same path: keep the first active one, or the first one if none is active
+            kept = next((e for e in run if e.active), run[0])
+            for dropped in run:
+                if dropped is kept or not dropped.active:
+                    continue
+                for method in list(totals):
+                    counts = file_entries.get(dropped.path, {})
+                    if method in counts:
+                        totals[method] -= counts[method]
+                    else:
+                        del totals[method]
+            f.write(kept.line+"\n")
+            return len(run)-1
+
+        for entry in heapq.merge(*streams, key=lambda e: canonical_key(e.path)):
+            if entry.path != run_key:
+                if run:
+                    n_duplicates += flush(run)
+                    n_entries += 1
+                run_key, run = entry.path, []
+            run.append(entry)
+        if run:
+            n_duplicates += flush(run)
+            n_entries += 1
+        for method, entries in totals.items():
+            f.write(format_trailer(entries, method)+"\n")
+    return {"entries": n_entries, "duplicates": n_duplicates, "trailers": totals}
+
+
+def iter_repository_xmls(campaign_list=None, root=repository_path):
+    """Yield the paths of all XML fragments of the given campaigns (default: all campaigns), sorted"""
+    for campaign in (campaign_list or campaigns):
+        for directory, subdirectories, filenames in os.walk(os.path.join(root, campaign)):
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(".xml"):
+                    yield os.path.join(directory, filename)
+
+
+def path_hash(path):
+    """64-bit hash of a normalised path. The hash of str is salted per interpreter, so values must not be stored."""
+    return hash(path) & 0xFFFFFFFFFFFFFFFF
+
+
+def find_duplicate_files(xml_paths):
+    """Find ntuples listed more than once, in one or several XML fragments
+
+    Only active entries are considered, paths are compared after normalisation. The first pass stores a 64-bit hash per
+    entry in a compact array (8 bytes per entry instead of a Python string), which is then sorted to find repeated hashes.
+    A second pass collects the actual paths behind the repeated hashes only, so hash collisions are never reported.
+
+    Returns:
+        :obj:`dict`: {path: [xml, xml, ...]} for every duplicated path, with one item per occurrence
+    """
+    from array import array
+    xml_paths = list(xml_paths)
+    hashes = array("Q")
+    xml_ids = array("L")
+    for xml_id, xml_path in enumerate(xml_paths):
+        for parsed, _ in iter_xml(xml_path):
+            if isinstance(parsed, XMLEntry) and parsed.active:
+                hashes.append(path_hash(normalise_path(parsed.path)))
+                xml_ids.append(xml_id)
+
+    try:
+        import numpy as np
+        sorted_hashes = np.sort(np.frombuffer(hashes, dtype=np.uint64))
+        repeated = set(int(h) for h in np.unique(sorted_hashes[1:][sorted_hashes[1:] == sorted_hashes[:-1]]))
+    except ImportError:
+        sorted_hashes = array("Q", sorted(hashes))
+        repeated = set(sorted_hashes[i] for i in range(1, len(sorted_hashes)) if sorted_hashes[i] == sorted_hashes[i-1])
+    del sorted_hashes
+    # Only the fragments containing a repeated hash have to be read again
+    affected = sorted(set(xml_ids[i] for i, h in enumerate(hashes) if h in repeated)) if len(repeated) > 0 else []
+    del hashes, xml_ids
+
+    occurrences = {}
+    if len(repeated) > 0:
+        for xml_path in (xml_paths[i] for i in affected):
+            for parsed, _ in iter_xml(xml_path):
+                if isinstance(parsed, XMLEntry) and parsed.active:
+                    path = normalise_path(parsed.path)
+                    if path_hash(path) in repeated:
+                        occurrences.setdefault(path, []).append(xml_path)
+    return {path: xmls for path, xmls in occurrences.items() if len(xmls) > 1}
+
+
+legacy_campaigns = ["RunII_102X_v1", "RunII_102X_v2"]
+legacy_shard_path = os.path.join(repository_path, "RunII_102X_values.json")
+legacy_prefix_pattern = re.compile(r"^(MC|DATA)_")
+legacy_suffix_pattern = re.compile(r"[_-](Tune|13TeV|madgraph|powheg|pythia|amcatnlo|herwig|sherpa|NNPDF|Fall17|Summer16|Autumn18|RunII|PSweights)", re.IGNORECASE)
+# The year and era of data fragments come in many spellings: SingleElectron_Run2017B, SingleMuon2016_RunB, JetHTRun2016B_ver1,
+# JetHT_2017B, JetHT2018B, SinglePhoton_2016B_ver1_v1, EGamma2018_RunA
+legacy_data_pattern = re.compile(r"^(?P<primary>[A-Za-z][A-Za-z0-9]*?)_?(?:Run)?20\d\d_?(?:Run)?(?P<era>[A-H])(?P<rest>_.*)?$")
+legacy_data_version_pattern = re.compile(r"_v\d+$")
+# Parts of a filename after the inferred name which don't distinguish variants of a process (tune, energy, generator, campaign, version)
+legacy_common_part_pattern = re.compile(r"^(Tune(?!Up$|Down$).*|13TeV|.*(madgraph|powheg|pythia|amcatnlo|herwig|sherpa|NNPDF).*|Fall17|Summer16|Autumn18|RunII.*|v\d+)$", re.IGNORECASE)
+
+
+def is_legacy_data(filename):
+    """Return whether a legacy XML fragment is data
+
+    Data fragments have a DATA_ prefix, are in a /data/ directory or, without MC_ prefix, are named after a primary dataset,
+    year and era (see legacy_data_pattern), e.g. "JetHT2018A.xml" or "MET_2016B_ver2_v1.xml".
+    """
+    basename = os.path.basename(filename)
+    if basename.startswith("DATA_") or "data" in os.path.dirname(filename).split(os.sep):
+        return True
+    return not basename.startswith("MC_") and legacy_data_pattern.match(basename[:-len(".xml")]) is not None
+
+
+def infer_sample_name(filename):
+    """Infer a process name from the filename of a legacy XML fragment
+
+    The MC_/DATA_ prefix and everything from the tune, energy, generator or campaign part on are removed, data fragments are
+    named like the UL ones, e.g. "MC_QCD_HT1000to1500_TuneCP5_13TeV-madgraph-pythia8.xml" -> "QCD_HT1000to1500",
+    "DATA_SingleElectron_Run2017E.xml" -> "SingleElectron_RunE" and "DATA_JetHTRun2016B_ver1.xml" -> "JetHT_RunB_ver1".
+    """
+    name = legacy_prefix_pattern.sub("", os.path.basename(filename)[:-len(".xml")])
+    data = legacy_data_pattern.match(name) if is_legacy_data(filename) else None
+    if data is not None:
+        return data.group("primary") + "_Run" + data.group("era") + legacy_data_version_pattern.sub("", data.group("rest") or "")
+    suffix = legacy_suffix_pattern.search(name)
+    return name[:suffix.start()] if suffix is not None and suffix.start() > 0 else name
+
+
+def infer_variant_name(filename):
+    """Infer a process name for a fragment whose inferred name (see infer_sample_name) is shared by other fragments of its period
+
+    The parts of the filename after the inferred name which distinguish variants are appended, e.g.
+    "QCD_Pt_300to470_TuneCUETPM1_13TeV_pythia8_ext.xml" -> "QCD_Pt_300to470_ext" and
+    "MC_DYJetsToNuNu_PtZ-400To650_TuneCUETP8M1_13TeV-amcatnloFXFX-pythia8_Summer16_ext1_v2.xml" -> "DYJetsToNuNu_PtZ-400To650_ext1".
+    """
+    name = infer_sample_name(filename)
+    full_name = legacy_prefix_pattern.sub("", os.path.basename(filename)[:-len(".xml")])
+    if not full_name.startswith(name):
+        return name
+    parts = [part for part in re.split(r"[_-]", full_name[len(name):]) if part != "" and legacy_common_part_pattern.match(part) is None]
+    return "_".join([name] + parts)
+
+
+def read_nevt(xml_path):
+    """Return (entries, method) of the NumberEntries trailer of a fragment, the sum of weights if present, (None, None) without trailer"""
+    trailers = read_trailers(xml_path)
+    for method in ("weights", "fast"):
+        if method in trailers:
+            return trailers[method], method
+    return None, None
+
+
+def import_legacy(campaign_list=None, output=legacy_shard_path, workers=16):
+    """Write a shard for CrossSectionHelper.py with the event counts and XML files of legacy (102X) campaigns
+
+    All XML fragments of the campaigns are scanned in a thread pool for their NumberEntries trailers. The period is the
+    directory below the campaign (2016v2, 2016v3, 2017, 2018), the process name is inferred from the filename (see
+    infer_sample_name). Fragments whose inferred names collide within a period are named after their variant (see
+    infer_variant_name), or after their full filename (without MC_/DATA_) if these collide as well. If several campaigns
+    provide the same process and period, the later campaign wins. Data fragments (see is_legacy_data) get a SampleInfo
+    with their run era.
+
+    Returns:
+        :obj:`dict`: Statistics with the keys "xmls", "samples", "without_trailer" and "overridden"
+    """
+    import concurrent.futures
+    import json
+    fragments = []
+    for campaign in (campaign_list or legacy_campaigns):
+        for xml_path in iter_repository_xmls([campaign]):
+            relative = os.path.relpath(xml_path, repository_path)
+            fragments.append((campaign, relative.split(os.sep)[1], relative))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(read_nevt, [os.path.join(repository_path, relative) for _, _, relative in fragments]))
+
+    names = {}
+    for campaign, period, relative in fragments:
+        names.setdefault((campaign, period, infer_sample_name(relative)), []).append(relative)
+    sample_names = {}
+    for (campaign, period, name), relatives in names.items():
+        for relative in relatives:
+            sample_names[relative] = name if len(relatives) == 1 else infer_variant_name(relative)
+    variants = {}
+    for campaign, period, relative in fragments:
+        variants.setdefault((campaign, period, sample_names[relative]), []).append(relative)
+    for relatives in variants.values():
+        for relative in (relatives if len(relatives) > 1 else []):
+            sample_names[relative] = legacy_prefix_pattern.sub("", os.path.basename(relative)[:-len(".xml")])
+
+    samples, periods, n_overridden, n_without_trailer = {}, set(), 0, 0
+    for (campaign, period, relative), (nevt, method) in zip(fragments, counts):
+        values = samples.setdefault(sample_names[relative], {"NEvents": {}, "XMLname": {}})
+        if is_legacy_data(relative):
+            data = legacy_data_pattern.match(legacy_prefix_pattern.sub("", os.path.basename(relative)[:-len(".xml")]))
+            values["SampleInfo"] = {"isData": True, "era": data.group("era") if data is not None else ""}
+        n_overridden += "Xml_"+period in values["XMLname"]
+        values["XMLname"]["Xml_"+period] = relative
+        values["NEvents"].pop("NEVT_"+period, None)
+        values["NEvents"].pop("NEVTSource_"+period, None)
+        if nevt is None:
+            n_without_trailer += 1
+        else:
+            values["NEvents"]["NEVT_"+period] = int(nevt) if method == "fast" else nevt
+            values["NEvents"]["NEVTSource_"+period] = "NumberEntries trailer (Method=%s) of %s" % (method, campaign)
+        periods.add(period)
+
+    shard = {"years": {period: "13TeV" for period in sorted(periods)}, "samples": {name: samples[name] for name in sorted(samples)}}
+    with atomic_write(output) as f:
+        json.dump(shard, f, indent=1, sort_keys=False)
+        f.write("\n")
+    return {"xmls": len(fragments), "samples": len(samples), "without_trailer": n_without_trailer, "overridden": n_overridden}
+
+
+def load_file_entries(path):
+    """Load per-file counts ({path: {method: entries}}) from a JSON file"""
+    import json
+    with open(path) as f:
+        return {normalise_path(k): v for k, v in json.load(f).items()}
+
+
+configure_storage_from_environment()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="DatasetXMLHelper: tools to maintain the dataset XML fragments of UHH2-datasets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser("merge", help="merge several XML fragments into one, removing duplicated files and adding up the NumberEntries trailers.")
+    merge_parser.add_argument("inputs", nargs="+", help="XML fragments to merge")
+    merge_parser.add_argument("-o", "--output", required=True, help="merged XML fragment to write")
+    merge_parser.add_argument("--file-entries", default=None, help="JSON file with per-file counts {path: {method: entries}}, used to correct the trailers for dropped duplicates")
+
+    duplicates_parser = subparsers.add_parser("duplicates", help="find ntuples listed twice, in the same or in different XML fragments.")
+    duplicates_parser.add_argument("xmls", nargs="*", help="XML fragments to check (default: all XML fragments of the selected campaigns)")
+    duplicates_parser.add_argument("--campaigns", nargs="+", default=campaigns, help="campaign directories to scan if no XML fragments are given (default: %(default)s)")
+    duplicates_parser.add_argument("--throw", action="store_true", help="raise an error if duplicates are found.")
+
+    canonicalise_parser = subparsers.add_parser("canonicalise", help="sort the entries of XML fragments in canonical order (crab task, block, file number) and normalise their paths, in-place.")
+    canonicalise_parser.add_argument("xmls", nargs="*", help="XML fragments to canonicalise (default: all XML fragments of the selected campaigns)")
+    canonicalise_parser.add_argument("--campaigns", nargs="+", default=campaigns, help="campaign directories to scan if no XML fragments are given (default: %(default)s)")
+    canonicalise_parser.add_argument("--check", action="store_true", help="only list the fragments which are not canonical, without rewriting them.")
+    canonicalise_parser.add_argument("--throw", action="store_true", help="raise an error if a fragment is not canonical. Should be used together with --check option.")
+
+    diff_parser = subparsers.add_parser("diff", help="compare the files listed in two XML fragments, grouped by crab task, and their NumberEntries trailers.")
+    diff_parser.add_argument("old", help="old fragment, either a path or <rev>:<path> for a version in git history")
+    diff_parser.add_argument("new", nargs="?", default=None, help="new fragment, either a path or <rev>:<path> (default: the working copy of the old fragment, which then has to be given as <rev>:<path>)")
+
+    generate_parser = subparsers.add_parser("generate", help="create an XML fragment from crab output directories, walking them in parallel.")
+    generate_parser.add_argument("roots", nargs="+", help="crab task directories, or directories containing them")
+    generate_parser.add_argument("-o", "--output", required=True, help="XML fragment to write")
+    generate_parser.add_argument("--workers", type=int, default=16, help="number of concurrent directory listings (default: %(default)s)")
+    generate_parser.add_argument("--all-timestamps", action="store_true", help="use all submissions of a crab task instead of only the latest one.")
+    generate_parser.add_argument("--count", action="store_true", help="open all ntuples (requires uproot) and add a NumberEntries trailer, unreadable or empty ntuples are commented out.")
+    generate_parser.add_argument("--register", nargs=2, metavar=("SAMPLE", "YEAR"), default=None, help="set the new fragment as XMLname of SAMPLE for YEAR in CrossSectionHelper.py, or in its JSON shard for the years of a shard such as 2022 (not for the generated legacy 102X shard, rerun import-legacy for those)")
+    generate_parser.add_argument("--source", default=None, help="DAS name of the dataset, stored as XmlSource together with --register")
+
+    sizes_parser = subparsers.add_parser("sizes", help="sum up the sizes of the files listed in XML fragments, per fragment and per campaign.")
+    sizes_parser.add_argument("xmls", nargs="*", help="XML fragments to check (default: all XML fragments of the selected campaigns)")
+    sizes_parser.add_argument("--campaigns", nargs="+", default=campaigns, help="campaign directories to scan if no XML fragments are given (default: %(default)s)")
+    sizes_parser.add_argument("--cache", default=FileInfoCache.default_path, help="file caching the sizes (default: %(default)s)")
+    sizes_parser.add_argument("--refresh", action="store_true", help="ignore the sizes stored in the cache.")
+    sizes_parser.add_argument("--workers", type=int, default=32, help="number of concurrent stat calls (default: %(default)s)")
+    sizes_parser.add_argument("--branches", nargs="+", default=None, help="estimate the read volume for these branches (wildcards allowed, requires uproot)")
+    sizes_parser.add_argument("--sample", type=int, default=3, help="number of files per fragment inspected to estimate the branch sizes (default: %(default)s)")
+
+    split_parser = subparsers.add_parser("split", help="split an XML fragment into one fragment per batch job, balancing the number of files, bytes or events.")
+    split_parser.add_argument("xml", help="XML fragment to split")
+    split_parser.add_argument("-o", "--output-directory", required=True, help="directory for the fragments <name>_<i>.xml")
+    split_group = split_parser.add_mutually_exclusive_group(required=True)
+    split_group.add_argument("-n", "--jobs", type=int, default=None, help="number of fragments to create")
+    split_group.add_argument("--max-per-job", type=float, default=None, help="maximum number of files, bytes or events per fragment")
+    split_parser.add_argument("--mode", choices=split_modes, default="bytes", help="what to balance between the fragments (default: %(default)s)")
+    split_parser.add_argument("--cache", default=FileInfoCache.default_path, help="file caching sizes and numbers of events (default: %(default)s)")
+    split_parser.add_argument("--workers", type=int, default=32, help="number of concurrent stat calls (default: %(default)s)")
+
+    check_parser = subparsers.add_parser("check", help="open all files listed in XML fragments (requires uproot) and report unreadable files and files with a missing or empty AnalysisTree.")
+    check_parser.add_argument("xmls", nargs="+", help="XML fragments to check")
+    check_parser.add_argument("--failures", default=None, help="write the list of problematic files to this file")
+    check_parser.add_argument("--cleaned", default=None, help="write a copy of the fragment with the problematic files commented out (only for a single fragment)")
+    check_parser.add_argument("--cache", default=FileInfoCache.default_path, help="file caching the numbers of entries (default: %(default)s)")
+    check_parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: number of CPUs)")
+    check_parser.add_argument("--tree", default="AnalysisTree", help="name of the tree to check (default: %(default)s)")
+
+    references_parser = subparsers.add_parser("references", help="cross-reference the XML fragments of the repository with the XMLname entries of CrossSectionHelper.py.")
+    references_parser.add_argument("xmls", nargs="*", help="list the processes using these XML fragments")
+    references_parser.add_argument("--campaigns", nargs="+", default=campaigns, help="campaign directories to scan for orphans (default: %(default)s)")
+    references_parser.add_argument("--orphans", action="store_true", help="list the XML fragments not used by any process. The legacy campaigns (%s) are skipped: import-legacy generates a process for each of their fragments." % ", ".join(legacy_campaigns))
+    references_parser.add_argument("--shared", action="store_true", help="list the XML fragments used by more than one process.")
+    references_parser.add_argument("--mismatches", action="store_true", help="list the XML fragments whose filename disagrees with their XmlSource DAS name.")
+
+    datasets_parser = subparsers.add_parser("datasets", help="look up the processes and XML fragments produced from DAS datasets, or list DAS datasets by their parts.")
+    datasets_parser.add_argument("names", nargs="*", help="DAS dataset names to look up, braces are expanded")
+    datasets_parser.add_argument("--primary", help="list the DAS datasets with this primary dataset, e.g. SingleMuon")
+    datasets_parser.add_argument("--era", help="list the DAS datasets of this acquisition era, e.g. Run2018A or RunIISummer20UL18MiniAODv2")
+    datasets_parser.add_argument("--processing", help="list the DAS datasets with this processing string, e.g. UL2018_MiniAODv2_GT36")
+
+    legacy_parser = subparsers.add_parser("import-legacy", help="write the shard with the event counts and XML fragments of the legacy (102X) campaigns for CrossSectionHelper.py.")
+    legacy_parser.add_argument("--campaigns", nargs="+", default=legacy_campaigns, help="legacy campaign directories to scan, later ones override earlier ones (default: %(default)s)")
+    legacy_parser.add_argument("-o", "--output", default=legacy_shard_path, help="shard file to write (default: %(default)s)")
+    legacy_parser.add_argument("-j", "--workers", type=int, default=16, help="number of XML fragments read concurrently (default: %(default)s)")
+
+    validate_parser = subparsers.add_parser("validate", help="validate the XML fragments and database entries changed with respect to a base revision.")
+    validate_parser.add_argument("--base", default="origin/master", help="revision to compare the working tree to, the merge base with HEAD is used (default: %(default)s)")
+    validate_parser.add_argument("--nevt-tolerance", type=float, default=1e-3, help="relative tolerance between NEVT and the NumberEntries trailers (default: %(default)s)")
+    validate_parser.add_argument("--strict", action="store_true", help="treat warnings (NEVT mismatches) as errors.")
+    validate_parser.add_argument("--throw", action="store_true", help="raise an error if the validation fails.")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "merge":
+        file_entries = load_file_entries(args.file_entries) if args.file_entries else None
+        stats = merge_xmls(args.inputs, args.output, file_entries)
+        print("Wrote %d entries to %s (%d duplicates removed)" % (stats["entries"], args.output, stats["duplicates"]))
+        for method in sorted(stats["trailers"]):
+            print("  NumberEntries(%s) = %s" % (method, format_entries(stats["trailers"][method], method)))
+    elif args.command == "duplicates":
+        xmls = args.xmls or list(iter_repository_xmls(args.campaigns))
+        duplicates = find_duplicate_files(xmls)
+        within, across = 0, 0
+        for path in sorted(duplicates):
+            xml_list = duplicates[path]
+            if len(set(xml_list)) < len(xml_list): within += 1
+            if len(set(xml_list)) > 1: across += 1
+            print(path)
+            for xml in sorted(set(xml_list)):
+                print("    %dx %s" % (xml_list.count(xml), os.path.relpath(xml, repository_path)))
+        print("Checked %d XML fragments: %d file(s) listed twice within one XML, %d file(s) listed in several XMLs" % (len(xmls), within, across))
+        if args.throw and len(duplicates) > 0:
+            raise ValueError("Duplicated ntuples found in the XML fragments")
+    elif args.command == "diff":
+        new = args.new
+        if new is None:
+            if os.path.exists(args.old) or ":" not in args.old:
+                parser.error("a second fragment is needed unless the first one is given as <rev>:<path>")
+            new = os.path.join(repository_path, args.old.split(":", 1)[1])
+        result = diff_xmls(args.old, new)
+        for task in sorted(result["tasks"]):
+            stats = result["tasks"][task]
+            print("%+8d %+8d  %s" % (stats["added"], -stats["removed"], task))
+        print("Added: %d, removed: %d (of which moved: %d), unchanged: %d" % (result["added"], result["removed"], result["moved"], result["unchanged"]))
+        for method, (old_entries, new_entries) in result["trailers"].items():
+            old_text = format_entries(old_entries, method) if old_entries is not None else "-"
+            new_text = format_entries(new_entries, method) if new_entries is not None else "-"
+            print("NumberEntries(%s): %s -> %s" % (method, old_text, new_text))
+    elif args.command == "generate":
+        ntuples, problems = generate_xml(args.roots, args.output, args.count, args.workers, args.all_timestamps)
+        print("Wrote %d entries to %s" % (len(ntuples), args.output))
+        for path, problem in sorted(problems.items()):
+            print("%s: %s (commented out)" % (path, problem))
+        if args.register is not None:
+            xml = os.path.relpath(os.path.abspath(args.output), repository_path)
+            register_xml(args.register[0], args.register[1], xml, args.source)
+            print("Registered %s as XMLname of %s for %s" % (xml, args.register[0], args.register[1]))
+    elif args.command == "sizes":
+        xmls = args.xmls or list(iter_repository_xmls(args.campaigns))
+        report = xml_sizes(xmls, FileInfoCache(args.cache), args.workers, args.refresh, args.branches, args.sample)
+        per_campaign = {}
+        for xml in xmls:
+            stats = report[xml]
+            relative = os.path.relpath(os.path.abspath(xml), repository_path)
+            campaign = per_campaign.setdefault(relative.split(os.sep)[0] if not relative.startswith("..") else "other", {})
+            for key, value in stats.items():
+                campaign[key] = campaign.get(key, 0) + value
+            line = "%10s %7d files" % (format_bytes(stats["bytes"]), stats["files"])
+            if args.branches: line += ", read %10s" % format_bytes(stats["read_bytes"])
+            if stats["missing"]: line += ", %d missing" % stats["missing"]
+            print(line + "  " + relative)
+        print("")
+        for campaign in sorted(per_campaign):
+            stats = per_campaign[campaign]
+            line = "%10s %7d files" % (format_bytes(stats["bytes"]), stats["files"])
+            if args.branches: line += ", read %10s" % format_bytes(stats["read_bytes"])
+            if stats["missing"]: line += ", %d missing" % stats["missing"]
+            print(line + "  " + campaign)
+    elif args.command == "split":
+        written = split_xml(args.xml, args.output_directory, args.jobs, args.max_per_job, args.mode, FileInfoCache(args.cache), args.workers)
+        for output, n_files, weight in written:
+            print("%6d files, %14s  %s" % (n_files, format_bytes(weight) if args.mode == "bytes" else "%d %s" % (weight, args.mode), output))
+        weights = [w for _, _, w in written]
+        print("Wrote %d fragments, largest/average %s per fragment: %.2f" % (len(written), args.mode, max(weights)/(sum(weights)/len(weights)) if sum(weights) > 0 else 1.0))
+    elif args.command == "check":
+        if args.cleaned and len(args.xmls) > 1:
+            parser.error("--cleaned can only be used with a single fragment")
+        cache = FileInfoCache(args.cache)
+        failures = []
+        for xml in args.xmls:
+            problems = check_xml(xml, args.cleaned, cache, args.workers, args.tree)
+            for path in sorted(problems, key=canonical_key):
+                failures.append("%s %s" % (path, problems[path]))
+            print("%d problematic file(s)  %s" % (len(problems), xml))
+        for failure in failures:
+            print(failure)
+        if args.failures:
+            with atomic_write(args.failures) as f:
+                f.write("".join(failure+"\n" for failure in failures))
+    elif args.command == "references":
+        from CrossSectionHelper import MCSampleValuesHelper
+        helper = MCSampleValuesHelper()
+        helper.load_lazy_shards()
+        for xml in args.xmls:
+            xml = os.path.relpath(os.path.abspath(xml), repository_path)
+            users = helper.get_samples_for_xml(xml)
+            print(xml + ": " + (", ".join("%s (%s)" % user for user in users) if len(users) > 0 else "not used"))
+        if args.orphans:
+            # Every fragment of the legacy campaigns is referenced by the generated shard, so they can't be orphans
+            skipped = [campaign for campaign in args.campaigns if campaign in legacy_campaigns]
+            if len(skipped) > 0:
+                print("Skipping the legacy campaigns " + ", ".join(skipped) + " (their processes are generated from the XML fragments)")
+            scanned = [campaign for campaign in args.campaigns if not campaign in skipped]
+            xmls = [os.path.relpath(xml, repository_path) for xml in iter_repository_xmls(scanned)] if len(scanned) > 0 else []
+            orphans = helper.get_orphan_xmls(xmls)
+            for xml in orphans:
+                print("Orphan: " + xml)
+            print("%d of %d XML fragments are not used by any process" % (len(orphans), len(xmls)))
+        if args.shared:
+            for xml, users in sorted(helper.get_shared_xmls().items()):
+                print("Shared: " + xml + ": " + ", ".join("%s (%s)" % user for user in users))
+        if args.mismatches:
+            for name, period, xml, source in helper.get_xml_source_mismatches():
+                print("Mismatch: %s (%s): %s was produced from %s" % (name, period, xml, source))
+    elif args.command == "datasets":
+        from CrossSectionHelper import MCSampleValuesHelper
+        helper = MCSampleValuesHelper()
+        helper.load_lazy_shards()
+        for name in [expanded for name in args.names for expanded in MCSampleValuesHelper.expand_braces(name)]:
+            users = helper.lookup_das(name)
+            print(name + ": " + (", ".join("%s (%s): %s" % user for user in users) if len(users) > 0 else "not used"))
+        if args.primary is not None or args.era is not None or args.processing is not None:
+            for name in helper.find_datasets(args.primary, args.era, args.processing):
+                print(name)
+    elif args.command == "import-legacy":
+        stats = import_legacy(args.campaigns, args.output, args.workers)
+        print("Wrote %d processes from %d XML fragments to %s (%d without NumberEntries trailer, %d overridden by a later campaign)"
+              % (stats["samples"], stats["xmls"], args.output, stats["without_trailer"], stats["overridden"]))
+    elif args.command == "validate":
+        errors, warnings, timing = validate_changes(args.base, args.nevt_tolerance)
+        for name, seconds in timing:
+            print("%8.3f s  %s" % (seconds, name))
+        for warning in warnings:
+            print("Warning: " + warning)
+        for error in errors:
+            print("Error: " + error)
+        print("%d error(s), %d warning(s)" % (len(errors), len(warnings)))
+        if args.throw and (len(errors) > 0 or (args.strict and len(warnings) > 0)):
+            raise ValueError("Validation of the changes failed")
+    elif args.command == "canonicalise":
+        xmls = args.xmls or list(iter_repository_xmls(args.campaigns))
+        changed = [xml for xml in xmls if canonicalise_xml(xml, check_only=args.check)]
+        for xml in changed:
+            print(("Not canonical: " if args.check else "Canonicalised: ") + os.path.relpath(xml, repository_path))
+        print("%d of %d XML fragments %s" % (len(changed), len(xmls), "are not canonical" if args.check else "rewritten"))
+        if args.check and args.throw and len(changed) > 0:
+            raise ValueError("XML fragments are not in canonical form")
+    return 0
+
+
+if(__name__ == "__main__"):
+    main()
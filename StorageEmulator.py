@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+
+import DatasetXMLHelper
+
+
+class StorageEmulator():
+    """Emulates the ntuple storage (/pnfs/desy.de/cms/tier2/...) in a local directory
+
+    Files are created under a local root directory at the same relative paths as on the storage, and the storage prefix is
+    redirected there through the remapping hook of DatasetXMLHelper, so that all tools can be run and benchmarked offline.
+    The files are tiny ROOT files containing an AnalysisTree with the requested number of entries and a weight branch, which
+    requires uproot and NumPy. Without them only empty placeholder files can be written (placeholder=True), on which
+    count_entries cannot be used.
+
+    Args:
+        root (`str`): Local directory holding the emulated storage, a temporary directory (removed on exit) if None
+        prefix (`str`): Storage prefix which is redirected to root
+        latency (`float`): Simulated latency in seconds added to every directory listing and stat call
+        tree (`str`): Name of the tree written to the ROOT files
+        weight_branch (`str`): Name of the weight branch written to the ROOT files
+
+    Example:
+        with StorageEmulator(latency=0.01) as storage:
+            storage.populate_from_xml("RunII_106X_v2/data/UL18/SingleMuon_Run2018A-UL2018_MiniAODv2_GT36-v1.xml", entries=100)
+            DatasetXMLHelper.count_entries("/pnfs/desy.de/cms/tier2/store/group/uhh/uhh2ntuples/...")
+    """
+
+    def __init__(self, root=None, prefix="/pnfs/desy.de", latency=0.0, tree="AnalysisTree", weight_branch="weight"):
+        self.__temporary = root is None
+        self.root = tempfile.mkdtemp(prefix="uhh2_storage_") if root is None else os.path.abspath(root)
+        self.prefix = prefix
+        self.latency = latency
+        self.tree = tree
+        self.weight_branch = weight_branch
+        self.__previous = None
+
+    def local_path(self, path):
+        """Return the local location of a storage path"""
+        if not path.startswith(self.prefix):
+            raise ValueError("ERROR StorageEmulator::The path \"" + str(path) + "\" is not below the emulated prefix \"" + self.prefix + "\"")
+        return self.root + path[len(self.prefix):]
+
+    def add_file(self, path, entries=10, weight=1.0, placeholder=False):
+        """Create an (emulated) ntuple at the storage path
+
+        Args:
+            entries (`int`): Number of entries of the tree
+            weight (`float`): Value of the weight branch for all entries
+            placeholder (`bool`): Write an empty file instead of a ROOT file, e.g. to emulate corrupt files
+
+        Raises:
+            ImportError: If uproot or NumPy is missing and placeholder is not set
+        """
+        local = self.local_path(DatasetXMLHelper.normalise_path(path))
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        if placeholder:
+            open(local, "w").close()
+            return local
+        try:
+            import numpy as np
+            import uproot
+        except ImportError as error:
+            raise ImportError("ERROR StorageEmulator::Writing ROOT files requires uproot and NumPy (" + str(error) + "), use placeholder=True for empty files")
+        with uproot.recreate(local) as f:
+            tree = f.mktree(self.tree, {self.weight_branch: np.float64})
+            tree.extend({self.weight_branch: np.full(entries, weight, dtype=np.float64)})
+        return local
+
+    def populate_from_xml(self, xml, entries=10, weight=1.0, placeholder=False):
+        """Create all files listed (active entries only) in an XML fragment
+
+        Args:
+            entries (`int` or callable): Number of entries per file, or a function returning it for a given path
+            weight (`float` or callable): Weight of all entries, or a function returning it for a given path
+
+        Returns:
+            `int`: The number of files created
+        """
+        n_files = 0
+        for parsed, _ in DatasetXMLHelper.iter_xml(xml):
+            if isinstance(parsed, DatasetXMLHelper.XMLEntry) and parsed.active:
+                self.add_file(parsed.path,
+                              entries(parsed.path) if callable(entries) else entries,
+                              weight(parsed.path) if callable(weight) else weight,
+                              placeholder)
+                n_files += 1
+        return n_files
+
+    def install(self):
+        """Redirect the storage prefix to the emulated storage and switch on the simulated latency"""
+        self.__previous = (dict(DatasetXMLHelper.storage_prefix_map), DatasetXMLHelper.storage_latency)
+        prefix_map = dict(self.__previous[0])
+        prefix_map[self.prefix] = self.root
+        DatasetXMLHelper.configure_storage(prefix_map, self.latency)
+
+    def uninstall(self):
+        """Restore the storage configuration from before install"""
+        if self.__previous is not None:
+            DatasetXMLHelper.configure_storage(*self.__previous)
+            self.__previous = None
+
+    def cleanup(self):
+        self.uninstall()
+        if self.__temporary:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        self.install()
+        return self
+
+    def __exit__(self, *args):
+        self.cleanup()
+
+
+if(__name__ == "__main__"):
+    import argparse
+    parser = argparse.ArgumentParser(description="StorageEmulator: create a local emulation of the ntuple storage for the files listed in XML fragments.")
+
+    parser.add_argument("xmls", nargs="+", help="XML fragments whose files are created")
+    parser.add_argument("--root", required=True, help="local directory holding the emulated storage")
+    parser.add_argument("--prefix", default="/pnfs/desy.de", help="storage prefix which is redirected to the local directory (default: %(default)s)")
+    parser.add_argument("--entries", type=int, default=10, help="number of entries per file (default: %(default)s)")
+    parser.add_argument("--weight", type=float, default=1.0, help="value of the weight branch (default: %(default)s)")
+    parser.add_argument("--placeholder", action="store_true", help="write empty placeholder files instead of ROOT files (no uproot needed)")
+
+    args = parser.parse_args()
+
+    storage = StorageEmulator(args.root, args.prefix)
+    n_files = sum(storage.populate_from_xml(xml, args.entries, args.weight, args.placeholder) for xml in args.xmls)
+    print("Created %d files below %s" % (n_files, storage.root))
+    print("Use them with: export %s=\"%s=%s\"" % (DatasetXMLHelper.storage_prefix_map_variable, storage.prefix, storage.root))
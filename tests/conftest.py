@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from StorageEmulator import StorageEmulator
+
+
+storage_directory = "/pnfs/desy.de/cms/tier2/store/user/test/TestSample/crab_TestSample/220101_120000/0000/"
+
+
+def ntuple_path(number):
+    return storage_directory + "Ntuple_%d.root" % number
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """An emulated storage below tmp_path, installed for the duration of a test"""
+    with StorageEmulator(str(tmp_path / "storage")) as emulator:
+        yield emulator
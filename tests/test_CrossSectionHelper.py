@@ -0,0 +1,330 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import CrossSectionHelper
+from CrossSectionHelper import MCSampleValuesHelper
+
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fresh_helper_query(expression):
+    """Evaluate an expression on a new MCSampleValuesHelper in a separate interpreter, so that no lazy shard is loaded yet"""
+    code = "import json\nfrom CrossSectionHelper import MCSampleValuesHelper\nhelper = MCSampleValuesHelper()\nprint(json.dumps(%s))" % expression
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=repository_path)
+    return json.loads(output.decode().strip().split("\n")[-1])
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("'JetMET_Run2022C' in helper.get_data_samples('13p6TeV', '2022')", True),
+    ("'QCD_Pt_300to470' in helper.search('QCD_Pt_300to470*')", True),
+    ("helper.get_data_lumi('2022')", 7980.4),
+    ("'2022' in helper.get_years()", True),
+    ("'2017' in helper.get_years('13TeV')", True),
+    ("helper.get_sample_info('JetHT_RunB_ver1').isData", True),
+    ("helper.get_xml('TT', '13TeV', '2016')", ""),
+])
+def test_queries_load_lazy_shards(expression, expected):
+    assert fresh_helper_query(expression) == expected
+
+
+def test_mc_samples_do_not_depend_on_call_order():
+    first, second = fresh_helper_query("[len(helper.get_mc_samples('13TeV', '2017')), len(helper.get_mc_samples('13TeV', '2017'))]")
+    assert first == second
+    assert first > 0
+
+
+def test_values_array_does_not_depend_on_call_order():
+    expression = "[len(column), sum(value != -1 for value in column)]"
+    fresh = fresh_helper_query("(lambda column: %s)(helper.get_values_array('NEvents', '13p6TeV', '2022'))" % expression)
+    loaded = fresh_helper_query("(lambda column: %s)(helper.load_lazy_shards() or helper.get_values_array('NEvents', '13p6TeV', '2022'))" % expression)
+    assert fresh == loaded
+    assert fresh[1] > 0
+    assert fresh_helper_query("list(helper.get_values_array('NEvents', '13p6TeV', '2022', ['QCD_Pt_300to470']))")[0] > 0
+
+
+def test_period_lookups_stay_lazy():
+    assert fresh_helper_query("[helper.get_lumi('TTToSemiLeptonic', '13TeV', 'UL17') > 0, "
+                              "sorted(helper._MCSampleValuesHelper__loaded_shards)]") == [True, []]
+
+
+def test_weights_match_get_lumi():
+    helper = MCSampleValuesHelper()
+    names, weights = helper.get_weights("UL17", 1.0, names=["TTToSemiLeptonic", "QCD_HT1000to1500"])
+    for name, weight in zip(names, weights):
+        assert weight == pytest.approx(1.0/helper.get_lumi(name, "13TeV", "UL17"))
+
+
+def test_weight_variations_accept_numpy_shifts():
+    np = pytest.importorskip("numpy")
+    helper = MCSampleValuesHelper()
+    names, weights = helper.get_weight_variations("UL17", [{"CrossSection": 1}, {"CrossSection": np.int64(1)}, {"CrossSection": np.ones(2)}],
+                                                  names=["TTToSemiLeptonic", "QCD_HT1000to1500"])
+    assert list(weights[0]) == list(weights[1]) == list(weights[2])
+    with pytest.raises(ValueError):
+        helper.get_weight_variations("UL17", [{"CrossSection": [1.0]}], names=names)
+
+
+def test_values_are_held_only_in_the_store():
+    helper = MCSampleValuesHelper()
+    helper.get_value_store()
+    values = {"CrossSection": MCSampleValuesHelper.XSValues(XSec_13TeV=12.5, XSecSource_13TeV="test", XSecUp_13TeV=0.1),
+              "NEvents": MCSampleValuesHelper.NEventsValues(NEVT_UL17=1000, NEVT_UL18=2000.5),
+              "XMLname": MCSampleValuesHelper.XMLValues(Xml_UL17="RunII_106X_v2/Test/UL17/TestSample.xml")}
+    helper.update_values({"TestStoredSample": values})
+    stored = helper._MCSampleValuesHelper__values_dict
+    assert isinstance(stored, CrossSectionHelper.StoredValues)
+    assert stored["TestStoredSample"] == values
+    assert type(stored["TestStoredSample"]["NEvents"].NEVT_UL17) == int
+    assert helper.get_nevt("TestStoredSample", "13TeV", "UL18") == 2000.5
+    assert helper.get_xs("TestStoredSample", "13TeV", "UL17") == 12.5
+
+
+def test_strict_lookups_of_unknown_periods_raise():
+    helper = MCSampleValuesHelper()
+    with pytest.raises(KeyError):
+        helper.get_nevt("TTToSemiLeptonic", "13TeV", "UL19")
+    with pytest.raises(KeyError):
+        helper.get_xs("TTToSemiLeptonic", "14TeV", "UL17")
+    # A value set for the energy is still returned, and non-strict lookups return the default
+    assert helper.get_xs("TTToSemiLeptonic", "13TeV", "UL19") == helper.get_xs("TTToSemiLeptonic", "13TeV", "UL17")
+    assert helper.get_value("TTToSemiLeptonic", "13TeV", "UL19", "NEvents") == -1
+
+
+def test_kfactor_shift_needs_kfactors():
+    helper = MCSampleValuesHelper()
+    names = ["TTToSemiLeptonic", "QCD_HT1000to1500"]
+    with pytest.raises(ValueError):
+        helper.get_weight_variations("UL17", [{"kFactor": 1}], names=names)
+    _, weights = helper.get_weight_variations("UL17", [None, {"kFactor": 0}], names=names, kFactor=True)
+    assert list(weights[0]) == list(weights[1])
+
+
+def test_lumi_cache_statistics_and_invalidation():
+    helper = MCSampleValuesHelper()
+    helper.clear_lumi_cache(reset_statistics=True)
+    lumi = helper.get_lumi("TTToSemiLeptonic", "13TeV", "UL17")
+    assert helper.get_lumi("TTToSemiLeptonic", "13TeV", "UL17") == lumi
+    assert helper.lumi_cache_info() == {"hits": 1, "misses": 1, "size": 1}
+    values = dict(helper._MCSampleValuesHelper__values_dict["TTToSemiLeptonic"])
+    nominal = values["CrossSection"]
+    values["CrossSection"] = MCSampleValuesHelper.XSValues(XSec_13TeV=2*helper.get_xs("TTToSemiLeptonic", "13TeV", "UL17"))
+    # An update through another instance invalidates the cached result
+    other = MCSampleValuesHelper({"TTToSemiLeptonic": values})
+    try:
+        assert helper.get_lumi("TTToSemiLeptonic", "13TeV", "UL17") == pytest.approx(lumi/2.0)
+        assert helper.lumi_cache_info()["misses"] == 2
+    finally:
+        values["CrossSection"] = nominal
+        other.update_values({"TTToSemiLeptonic": values})
+    assert helper.get_lumi("TTToSemiLeptonic", "13TeV", "UL17") == lumi
+    helper.clear_lumi_cache()
+    assert helper.lumi_cache_info() == {"hits": 1, "misses": 3, "size": 0}
+
+
+def test_lookup_profiler(tmp_path):
+    output = str(tmp_path / "profile.json")
+    code = ("from CrossSectionHelper import MCSampleValuesHelper\nhelper = MCSampleValuesHelper()\n"
+            "helper.get_lumi('TTToSemiLeptonic', '13TeV', 'UL17')\nhelper.get_kfactor('TTToSemiLeptonic', '13TeV', 'UL17')\n"
+            "for name in ['NoSuchProcess', 'TTToSemiLeptonic']:\n"
+            "    try: helper.get_nevt(name, '13TeV', 'UL19')\n    except KeyError: pass\n")
+    subprocess.check_call([sys.executable, "-c", code], cwd=repository_path, env=dict(os.environ, CROSSSECTIONHELPER_PROFILE=output), stdout=subprocess.DEVNULL)
+    with open(output) as f:
+        summary = json.load(f)
+    assert summary["unknown_processes"] == 1
+    assert summary["strict_misses"] == 1
+    assert summary["default_fallbacks"] >= 1
+    assert summary["calls"]["get_lumi"]["TTToSemiLeptonic"]["calls"] == 1
+    assert summary["calls"]["get_value"]["TTToSemiLeptonic|NEvents"]["calls"] >= 1
+    # Without the environment variable the lookup methods are not wrapped
+    environment = {key: value for key, value in os.environ.items() if key != "CROSSSECTIONHELPER_PROFILE"}
+    code = "import CrossSectionHelper\nprint(CrossSectionHelper.lookup_profiler)"
+    assert subprocess.check_output([sys.executable, "-c", code], cwd=repository_path, env=environment).strip() == b"None"
+
+
+def test_name_index_search_and_suggest():
+    index = CrossSectionHelper.SampleNameIndex(["ZPrimeToTT_M400_W40", "ZPrimeToTT_M500_W50", "ZPrimeToTT_M400_W4", "WW"])
+    assert index.search("ZPrimeToTT_M*_W40") == ["ZPrimeToTT_M400_W40"]
+    assert index.search("ZPrimeToTT_M400_W4?") == ["ZPrimeToTT_M400_W40"]
+    assert index.search("WW") == ["WW"]
+    assert index.search("W") == []
+    assert index.with_prefix("ZPrimeToTT_M4") == ["ZPrimeToTT_M400_W4", "ZPrimeToTT_M400_W40"]
+    assert index.suggest("ZprimeToTT_M400_W40")[0] == "ZPrimeToTT_M400_W40"
+    assert index.suggest("QCD") == []
+
+
+def test_unknown_process_suggestions():
+    helper = MCSampleValuesHelper()
+    assert set(helper.search("TTTo*")) >= {"TTToSemiLeptonic", "TTTo2L2Nu", "TTToHadronic"}
+    with pytest.raises(KeyError, match="Did you mean \"TTToSemiLeptonic\""):
+        helper.get_xs("TTToSemiLepton", "13TeV", "UL17")
+
+
+def test_signal_points_and_grid():
+    np = pytest.importorskip("numpy")
+    helper = MCSampleValuesHelper()
+    assert helper.parse_signal_name("ZPrimeToTT_M400_W40") == ("ZPrimeToTT", {"mass": 400.0, "width": 40.0})
+    assert helper.parse_signal_name("TTToSemiLeptonic") is None
+    points = helper.get_signal_points("ZPrimeToTT")
+    assert points == sorted(points, key=lambda point: (point[1]["mass"], point[1]["width"]))
+    grid = helper.get_signal_grid("ZPrimeToTT", "13TeV", "UL17")
+    assert list(grid["name"]) == [name for name, _ in points]
+    assert list(grid["mass"]) == [parameters["mass"] for _, parameters in points]
+    assert len(grid["xs"]) == len(grid["nevt"]) == len(grid["lumi"]) == len(points)
+    measured = ~np.isnan(grid["nevt"])
+    assert np.all(grid["lumi"][measured] == grid["nevt"][measured]/grid["xs"][measured])
+    with pytest.raises(KeyError):
+        helper.get_signal_points("NoSuchFamily")
+
+
+@pytest.fixture
+def interpolation_family():
+    """A signal family with the cross sections 10, 1 and 0.2 pb at the masses 1000, 2000 and 3000"""
+    MCSampleValuesHelper.register_signal_grid("TestResonance", r"TestResonance_M(?P<mass>\d+)")
+    values = {"TestResonance_M%d" % mass: {"CrossSection": MCSampleValuesHelper.XSValues(XSec_13TeV=xs)}
+              for mass, xs in [(1000, 10.0), (2000, 1.0), (3000, 0.2)]}
+    return MCSampleValuesHelper(values)
+
+
+def test_interpolated_cross_sections(interpolation_family):
+    helper = interpolation_family
+    assert [name for name, _ in helper.get_signal_points("TestResonance")] == ["TestResonance_M1000", "TestResonance_M2000", "TestResonance_M3000"]
+    name = helper.add_interpolated_point("TestResonance", "13TeV", "UL17", 1500)
+    assert name == "TestResonance_M1500"
+    assert helper.is_interpolated(name)
+    assert helper.get_xs(name, "13TeV", "UL17") == pytest.approx(10**0.5)
+    assert "loglinear" in helper.get_xs(name, "13TeV", "UL17", info="Source")
+    assert helper.add_interpolated_point("TestResonance", "13TeV", "UL17", 2000) == "TestResonance_M2000"
+    spline = helper.interpolate_xs("TestResonance", "13TeV", "UL17", 1500, method="spline")
+    assert spline != pytest.approx(10**0.5)
+    assert 1.0 < spline < 10.0
+    assert "spline" in helper.get_xs(name, "13TeV", "UL17", info="Source")
+    # Interpolated points are not part of the grid, and there is no extrapolation
+    assert len(helper.get_signal_points("TestResonance")) == 3
+    with pytest.raises(ValueError):
+        helper.add_interpolated_point("TestResonance", "13TeV", "UL17", 3500)
+    with pytest.raises(ValueError):
+        helper.add_interpolated_point("TestResonance", "13TeV", "UL17", 1500, method="cubic")
+
+
+def test_xml_index():
+    helper = MCSampleValuesHelper()
+    xml = "RunII_106X_v2/SM/UL17/WW_CP5_pythia8_Summer20UL17_v1.xml"
+    assert helper.get_samples_for_xml(xml) == [("WW", "UL17")]
+    assert helper.get_samples_for_xml("./" + xml) == [("WW", "UL17")]
+    assert helper.get_orphan_xmls([xml, "RunII_106X_v2/SM/UL17/NoSuchSample.xml"]) == ["RunII_106X_v2/SM/UL17/NoSuchSample.xml"]
+    # The index follows updates of the XMLname entries
+    helper.update_values({"TestSharedXML": {"XMLname": MCSampleValuesHelper.XMLValues(Xml_UL17=xml)}})
+    assert sorted(helper.get_samples_for_xml(xml)) == [("TestSharedXML", "UL17"), ("WW", "UL17")]
+    assert helper.get_shared_xmls()[xml] == helper.get_samples_for_xml(xml)
+
+
+def test_das_index():
+    helper = MCSampleValuesHelper()
+    source = "/WW_TuneCP5_13TeV-pythia8/RunIISummer20UL17MiniAODv2-106X_mc2017_realistic_v9-v1/MINIAODSIM"
+    parsed = helper.parse_das_name(source[1:])
+    assert (parsed["name"], parsed["primary"], parsed["era"], parsed["tier"]) == (source, "WW_TuneCP5_13TeV-pythia8", "RunIISummer20UL17MiniAODv2", "MINIAODSIM")
+    assert helper.parse_das_name("not a dataset") is None
+    assert helper.lookup_das(source) == [("WW", "UL17", "RunII_106X_v2/SM/UL17/WW_CP5_pythia8_Summer20UL17_v1.xml")]
+    assert helper.lookup_das("/NoSuchDataset/Run2018A-v1/MINIAOD") == []
+    assert helper.expand_braces("/SingleMuon/Run2018{A,B}-UL2018_MiniAODv2-v3/MINIAOD") == [
+        "/SingleMuon/Run2018A-UL2018_MiniAODv2-v3/MINIAOD", "/SingleMuon/Run2018B-UL2018_MiniAODv2-v3/MINIAOD"]
+    datasets = helper.find_datasets(primary="SingleMuon", era="Run2018A")
+    assert len(datasets) > 0 and all(name.startswith("/SingleMuon/Run2018A-") for name in datasets)
+
+
+def test_xml_source_mismatches():
+    helper = MCSampleValuesHelper()
+    xml = "RunII_106X_v2/data/UL16postVFP/MuonEG_Run2016F-UL2016_MiniAODv2-v2.xml"
+    assert helper.xml_matches_source(xml, "/MuonEG/Run2016F-UL2016_MiniAODv2-v2/MINIAOD")
+    assert helper.xml_matches_source(xml, "MuonEG/Run2016{E,F}-UL2016_MiniAODv2-v2/MINIAOD")
+    assert not helper.xml_matches_source(xml, "/MuonEG/Run2016H-UL2016_MiniAODv2-v2/MINIAOD")
+    assert helper.xml_matches_source("RunII_106X_v2/SM/UL17/WW_CP5_pythia8_Summer20UL17_v1.xml",
+                                     "/WW_TuneCP5_13TeV-pythia8/RunIISummer20UL17MiniAODv2-106X_mc2017_realistic_v9-v1/MINIAODSIM")
+    for name, period, xml, source in helper.get_xml_source_mismatches():
+        assert not helper.xml_matches_source(xml, source)
+
+
+def test_era_lumi():
+    helper = MCSampleValuesHelper()
+    eras = helper.get_eras("UL17")
+    assert eras == ["B", "C", "D", "E", "F"]
+    assert helper.get_data_lumi("UL17") == pytest.approx(sum(helper.get_era_lumi("UL17", era) for era in eras))
+    assert helper.get_data_lumi("UL17", ["B", "C"]) == pytest.approx(helper.get_era_lumi("UL17", "B") + helper.get_era_lumi("UL17", "C"))
+    assert helper.get_data_lumi(["UL16preVFP", "UL16postVFP"]) == pytest.approx(helper.get_data_lumi("UL16preVFP") + helper.get_data_lumi("UL16postVFP"))
+    with pytest.raises(KeyError):
+        helper.get_era_lumi("UL17", "H")
+    names = helper.get_data_samples("13TeV", "UL17", era="C")
+    assert len(names) > 0
+    assert list(helper.get_data_sample_lumis(names, "UL17")) == [helper.get_era_lumi("UL17", "C")]*len(names)
+    with pytest.raises(KeyError):
+        helper.get_data_sample_lumis(["TTToSemiLeptonic"], "UL17")
+    MCSampleValuesHelper.set_era_lumi("TestYear", "A", 100, "test", (1, 2))
+    assert (helper.get_era_lumi("TestYear", "A"), helper.get_era_lumi("TestYear", "A", "Source"), helper.get_era_runs("TestYear", "A")) == (100.0, "test", (1, 2))
+
+
+def test_sample_value_store():
+    NEventsValues = CrossSectionHelper.namedtuple_with_defaults("NEventsValues", ["NEVT_13TeV", "NEVTSource_13TeV", "NEVT_UL18", "NEVTSource_UL18"], [-1.0, "", -1.0, ""])
+    store = CrossSectionHelper.SampleValueStore([("NEvents", "NEVT", -1.0)], ["13TeV", "UL18"])
+    store.add("WW", {"NEvents": NEventsValues(NEVT_UL18=15679000, NEVTSource_UL18="DAS")})
+    store.add("WZ", {"NEvents": NEventsValues(NEVT_13TeV=10.5, NEVT_UL18=20.0)})
+    store.add("Data", {"SampleInfo": MCSampleValuesHelper.SampleInfo(isData=True)})
+    assert store.get("WW", "NEvents", "", "13TeV", "UL18", -1.0) == 15679000
+    assert type(store.get("WW", "NEvents", "", "13TeV", "UL18", -1.0)) == int
+    assert store.get("WW", "NEvents", "Source", "13TeV", "UL18", "") == "DAS"
+    # The energy takes precedence over the year, unset values return the default or missing
+    assert store.get("WZ", "NEvents", "", "13TeV", "UL18", -1.0) == 10.5
+    assert store.get("WW", "NEvents", "", "13TeV", "UL17", -1.0, missing=None) == -1.0
+    assert list(store.column("NEvents", "13TeV", "UL18", -1.0)) == [15679000, 10.5, -1.0]
+    assert store.has_key("WW", "NEvents") and not store.has_key("Data", "NEvents")
+    value_types = {"NEvents": NEventsValues}
+    assert store.values("WW", value_types) == {"NEvents": NEventsValues(NEVT_UL18=15679000, NEVTSource_UL18="DAS")}
+    assert store.values("Data", value_types) == {"SampleInfo": MCSampleValuesHelper.SampleInfo(isData=True)}
+    # Adding a sample again replaces all its values
+    store.add("WW", {"NEvents": NEventsValues(NEVT_13TeV=5.0)})
+    assert store.values("WW", value_types) == {"NEvents": NEventsValues(NEVT_13TeV=5.0)}
+    assert len(store) == 3
+
+
+def test_register_period():
+    code = ("(MCSampleValuesHelper.register_period('2023', year_energy='13p6TeV'), "
+            "helper.update_values({'TestRun3': {'NEvents': MCSampleValuesHelper.NEventsValues(NEVT_2023=1000, NEVT_UL17=10)}}), "
+            "[helper.get_nevt('TestRun3', '13p6TeV', '2023'), helper.get_nevt('TestRun3', '13TeV', 'UL17'), "
+            "'2023' in helper.get_years('13p6TeV'), '2023' in helper.get_years('13TeV'), "
+            "helper.get_xs('TTToSemiLeptonic', '13TeV', 'UL17') > 0, helper.get_value('TTToSemiLeptonic', '13p6TeV', '2023', 'NEvents'), "
+            "'NEVT_2023' in MCSampleValuesHelper.NEventsValues._fields])[-1]")
+    assert fresh_helper_query(code) == [1000, 10, True, False, True, -1, True]
+
+
+@pytest.mark.parametrize("extension", [".json", ".yaml", ".root"])
+def test_export_weights(tmp_path, extension):
+    names = ["TTToSemiLeptonic", "QCD_HT1000to1500"]
+    output = str(tmp_path / ("weights" + extension))
+    if extension == ".yaml":
+        yaml = pytest.importorskip("yaml")
+    if extension == ".root":
+        uproot = pytest.importorskip("uproot")
+    weights = CrossSectionHelper.export_weights(output, ["UL17", "UL18"], {"UL17": 41480.0, "UL18": 59830.0}, names=names)
+    expected = MCSampleValuesHelper().get_weights("UL17", 41480.0, names=names)
+    assert weights["UL17"][0] == expected[0] and list(weights["UL17"][1]) == list(expected[1])
+    if extension == ".root":
+        with uproot.open(output) as f:
+            metadata = json.loads(str(f["metadata"]))
+            content = {year: dict(zip(f[year]["name"].array(library="np"), f[year]["weight"].array(library="np"))) for year in ["UL17", "UL18"]}
+    else:
+        with open(output) as f:
+            metadata = json.load(f) if extension == ".json" else yaml.safe_load(f)
+        content = metadata.pop("weights")
+    assert metadata == {"kFactor": False, "Corrections": False, "lumi": {"UL17": 41480.0, "UL18": 59830.0}}
+    assert content["UL17"] == pytest.approx(dict(zip(*expected)))
+
+
+def test_export_weights_errors(tmp_path):
+    with pytest.raises(ValueError):
+        CrossSectionHelper.export_weights(str(tmp_path / "weights.txt"), ["UL17"], 1.0, names=["TTToSemiLeptonic"])
+    with pytest.raises(KeyError):
+        CrossSectionHelper.export_weights(str(tmp_path / "weights.json"), ["UL17"], {"UL18": 1.0}, names=["TTToSemiLeptonic"])
@@ -0,0 +1,223 @@
+import os
+import sys
+
+import pytest
+
+import DatasetXMLHelper
+from conftest import ntuple_path
+
+
+def test_add_file_requires_uproot(storage, monkeypatch):
+    monkeypatch.setitem(sys.modules, "uproot", None)
+    with pytest.raises(ImportError):
+        storage.add_file(ntuple_path(1))
+    local = storage.add_file(ntuple_path(1), placeholder=True)
+    assert os.path.getsize(local) == 0
+
+
+def test_merge_removes_duplicates(tmp_path):
+    first, second, merged = str(tmp_path / "first.xml"), str(tmp_path / "second.xml"), str(tmp_path / "merged.xml")
+    DatasetXMLHelper.write_xml(first, [ntuple_path(1), ntuple_path(2)], {"fast": 30})
+    DatasetXMLHelper.write_xml(second, [ntuple_path(2), ntuple_path(10)], {"fast": 30})
+
+    stats = DatasetXMLHelper.merge_xmls([first, second], merged, {ntuple_path(2): {"fast": 10}})
+    assert stats == {"entries": 3, "duplicates": 1, "trailers": {"fast": 50}}
+    assert DatasetXMLHelper.active_paths(merged) == [ntuple_path(1), ntuple_path(2), ntuple_path(10)]
+    assert DatasetXMLHelper.read_trailers(merged) == {"fast": 50}
+
+    # Without the count of the dropped duplicate the total is unknown
+    stats = DatasetXMLHelper.merge_xmls([first, second], merged)
+    assert stats["trailers"] == {}
+    assert DatasetXMLHelper.read_trailers(merged) == {}
+
+
+def test_split_by_files(tmp_path):
+    xml = str(tmp_path / "Sample.xml")
+    DatasetXMLHelper.write_xml(xml, [ntuple_path(i) for i in range(1, 6)])
+    written = DatasetXMLHelper.split_xml(xml, str(tmp_path / "split"), n_jobs=2, mode="files")
+    assert [n_files for _, n_files, _ in written] == [2, 3]
+    assert sum((DatasetXMLHelper.active_paths(output) for output, _, _ in written), []) == [ntuple_path(i) for i in range(1, 6)]
+
+
+def test_check_and_split_by_events(storage, tmp_path):
+    pytest.importorskip("uproot")
+    xml = str(tmp_path / "Sample.xml")
+    DatasetXMLHelper.write_xml(xml, [ntuple_path(i) for i in range(1, 6)], {"fast": 1234})
+    for i, entries in enumerate([100, 10, 10, 0], 1):
+        storage.add_file(ntuple_path(i), entries)
+    storage.add_file(ntuple_path(5), placeholder=True)
+
+    cache = DatasetXMLHelper.FileInfoCache(str(tmp_path / "cache.json"))
+    cleaned = str(tmp_path / "Sample_cleaned.xml")
+    problems = DatasetXMLHelper.check_xml(xml, cleaned, cache, workers=2)
+    assert problems[ntuple_path(4)] == "EMPTY"
+    assert problems[ntuple_path(5)].startswith("BAD")
+    assert len(problems) == 2
+    assert DatasetXMLHelper.active_paths(cleaned) == [ntuple_path(i) for i in range(1, 4)]
+    assert DatasetXMLHelper.read_trailers(cleaned) == {"fast": 120}
+    assert DatasetXMLHelper.validate_xml(cleaned) == []
+
+    written = DatasetXMLHelper.split_xml(cleaned, str(tmp_path / "split"), n_jobs=2, mode="events", cache=cache)
+    assert sorted(weight for _, _, weight in written) == [20, 100]
+    assert sorted(DatasetXMLHelper.read_trailers(output)["fast"] for output, _, _ in written) == [20, 100]
+
+
+def test_generate_counts_entries(storage, tmp_path):
+    pytest.importorskip("uproot")
+    for i, entries in enumerate([5, 7, 0], 1):
+        storage.add_file(ntuple_path(i), entries)
+    output = str(tmp_path / "Sample.xml")
+    ntuples, problems = DatasetXMLHelper.generate_xml([os.path.dirname(ntuple_path(1))], output, count=True, workers=2)
+    assert ntuples == [ntuple_path(i) for i in range(1, 4)]
+    assert problems == {ntuple_path(3): "EMPTY"}
+    assert DatasetXMLHelper.active_paths(output) == [ntuple_path(1), ntuple_path(2)]
+    assert DatasetXMLHelper.read_trailers(output) == {"fast": 12}
+
+
+def test_validate_xml_reports_problems(tmp_path):
+    xml = str(tmp_path / "Sample.xml")
+    with open(xml, "w") as f:
+        f.write('<In FileName="%s" Lumi="0.0"/>\n' % ntuple_path(1))
+        f.write('<In FileName="%s" Lumi="0.0">\n' % ntuple_path(2))
+    problems = DatasetXMLHelper.validate_xml(xml)
+    assert "no NumberEntries trailer" in problems
+    assert any(problem.startswith("line 2:") for problem in problems)
+
+
+def test_validate_changes_without_changes():
+    errors, _, _ = DatasetXMLHelper.validate_changes("HEAD")
+    assert errors == []
+
+
+def test_validate_changes_reports_deleted_xml(tmp_path):
+    xml = "RunII_106X_v2/SM/UL17/WW_CP5_pythia8_Summer20UL17_v1.xml"
+    moved = str(tmp_path / "moved.xml")
+    os.rename(os.path.join(DatasetXMLHelper.repository_path, xml), moved)
+    try:
+        errors, _, _ = DatasetXMLHelper.validate_changes("HEAD")
+    finally:
+        os.rename(moved, os.path.join(DatasetXMLHelper.repository_path, xml))
+    assert "WW (UL17): XML not found: " + xml in errors
+
+
+@pytest.mark.parametrize("filename, name, is_data", [
+    ("RunII_102X_v2/2018/JetHT2018B.xml", "JetHT_RunB", True),
+    ("RunII_102X_v2/2016v3/MET_2016B_ver2_v1.xml", "MET_RunB_ver2", True),
+    ("RunII_102X_v2/2018/MET_2018D_v2.xml", "MET_RunD", True),
+    ("RunII_102X_v2/2016v3/DATA_JetHTRun2016B_ver1.xml", "JetHT_RunB_ver1", True),
+    ("RunII_102X_v2/2017/DATA_JetHT_2017B.xml", "JetHT_RunB", True),
+    ("RunII_102X_v1/2016v3/DATA_SingleMuon2016_RunB.xml", "SingleMuon_RunB", True),
+    ("RunII_102X_v2/2016v3/DATA_SinglePhoton_2016B_ver1_v1.xml", "SinglePhoton_RunB_ver1", True),
+    ("RunII_102X_v1/2017/MC_QCD_HT1000to1500_TuneCP5_13TeV-madgraph-pythia8.xml", "QCD_HT1000to1500", False),
+])
+def test_legacy_names(filename, name, is_data):
+    assert DatasetXMLHelper.is_legacy_data(filename) == is_data
+    assert DatasetXMLHelper.infer_sample_name(filename) == name
+
+
+def test_legacy_variant_names():
+    assert DatasetXMLHelper.infer_variant_name("QCD_Pt_300to470_TuneCUETPM1_13TeV_pythia8_ext.xml") == "QCD_Pt_300to470_ext"
+    assert DatasetXMLHelper.infer_variant_name("MC_TT_TuneUp.xml") == "TT_TuneUp"
+
+
+class Branch():
+    def __init__(self, name, compressed_bytes, branches=()):
+        self.name, self.compressed_bytes, self.branches = name, compressed_bytes, list(branches)
+
+
+def test_selected_bytes_of_split_objects():
+    jets = Branch("jetsAk4Puppi", 0, [Branch("jetsAk4Puppi.m_pt", 100), Branch("jetsAk4Puppi.m_eta", 80), Branch("jetsAk4Puppi.m_phi", 70)])
+    muons = Branch("slimmedMuons", 10, [Branch("slimmedMuons.m_pt", 30)])
+    tree = [jets, muons, Branch("weight", 5)]
+    assert DatasetXMLHelper.selected_bytes(tree, ["jetsAk4Puppi"]) == 250
+    assert DatasetXMLHelper.selected_bytes(tree, ["jetsAk4Puppi.m_pt", "jetsAk4Puppi.m_eta"]) == 180
+    assert DatasetXMLHelper.selected_bytes(tree, ["*.m_pt"]) == 130
+    assert DatasetXMLHelper.selected_bytes(tree, ["slimmed*", "weight"]) == 45
+
+
+def test_branch_fraction(storage):
+    pytest.importorskip("uproot")
+    storage.add_file(ntuple_path(1), 1000)
+    assert 0 < DatasetXMLHelper.branch_fraction([ntuple_path(1)], ["weight"]) < 1
+    assert DatasetXMLHelper.branch_fraction([ntuple_path(1)], ["missing*"]) == 0
+
+
+def test_orphans_skip_legacy_campaigns(capsys):
+    DatasetXMLHelper.main(["references", "--orphans", "--campaigns", "RunII_102X_v2", "Run3_124X_v1"])
+    output = capsys.readouterr().out
+    assert "Skipping the legacy campaigns RunII_102X_v2" in output
+    assert not "Orphan: RunII_102X" in output
+    assert "Orphan: Run3_124X_v1/" in output
+
+
+def test_find_duplicate_files(tmp_path, monkeypatch):
+    first, second = str(tmp_path / "first.xml"), str(tmp_path / "second.xml")
+    DatasetXMLHelper.write_xml(first, [ntuple_path(1), ntuple_path(2), ntuple_path(3)], problems={ntuple_path(3): "BAD"})
+    DatasetXMLHelper.write_xml(second, [ntuple_path(2).replace("/store/", "//store/"), ntuple_path(3), ntuple_path(4), ntuple_path(4)])
+    # Paths are compared normalised, commented out entries are ignored
+    assert DatasetXMLHelper.find_duplicate_files([first, second]) == {ntuple_path(2): [first, second], ntuple_path(4): [second, second]}
+    assert DatasetXMLHelper.find_duplicate_files([first]) == {}
+    # The same result without NumPy
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    assert DatasetXMLHelper.find_duplicate_files([first, second]) == {ntuple_path(2): [first, second], ntuple_path(4): [second, second]}
+
+
+def test_canonicalise_xml(tmp_path):
+    xml = str(tmp_path / "Sample.xml")
+    other = ntuple_path(1).replace("/0000/", "/0001/")
+    DatasetXMLHelper.write_xml(xml, [ntuple_path(10), ntuple_path(2).replace("/store/", "//store/"), ntuple_path(1)], {"fast": 30})
+    with open(xml, "a") as f:
+        f.write('<In FileName="%s" Lumi="0.0"/>\n' % other)
+    assert DatasetXMLHelper.natural_key("Ntuple_2.root") < DatasetXMLHelper.natural_key("Ntuple_10.root")
+    # Entries are sorted within their run, the trailer stays behind the entries it counts
+    assert list(DatasetXMLHelper.iter_canonical_lines(xml)) == [
+        '<In FileName="%s" Lumi="0.0"/>' % ntuple_path(1),
+        '<In FileName="%s" Lumi="0.0"/>' % ntuple_path(2),
+        '<In FileName="%s" Lumi="0.0"/>' % ntuple_path(10),
+        DatasetXMLHelper.format_trailer(30, "fast"),
+        '<In FileName="%s" Lumi="0.0"/>' % other,
+    ]
+    with open(xml) as f:
+        original = f.read()
+    assert DatasetXMLHelper.canonicalise_xml(xml, check_only=True)
+    with open(xml) as f:
+        assert f.read() == original
+    assert DatasetXMLHelper.canonicalise_xml(xml)
+    assert not DatasetXMLHelper.canonicalise_xml(xml, check_only=True)
+    assert DatasetXMLHelper.active_paths(xml) == [ntuple_path(1), ntuple_path(2), ntuple_path(10), other]
+
+
+def test_diff_xmls(tmp_path):
+    old, new = str(tmp_path / "old.xml"), str(tmp_path / "new.xml")
+    resubmitted = ntuple_path(3).replace("220101_120000", "220202_120000")
+    DatasetXMLHelper.write_xml(old, [ntuple_path(1), ntuple_path(2), ntuple_path(3)], {"fast": 30})
+    DatasetXMLHelper.write_xml(new, [ntuple_path(2), resubmitted, ntuple_path(4), ntuple_path(1)], {"fast": 40}, problems={ntuple_path(1): "EMPTY"})
+    result = DatasetXMLHelper.diff_xmls(old, new)
+    # The commented out entry counts as removed, the resubmitted file as moved
+    assert (result["added"], result["removed"], result["moved"], result["unchanged"]) == (2, 2, 1, 1)
+    assert result["trailers"] == {"fast": (30, 40)}
+    assert sum(task["added"] for task in result["tasks"].values()) == 2
+
+    # A version in the git history
+    xml = "RunII_106X_v2/SM/UL17/WW_CP5_pythia8_Summer20UL17_v1.xml"
+    result = DatasetXMLHelper.diff_xmls("HEAD:" + xml, os.path.join(DatasetXMLHelper.repository_path, xml))
+    assert result["added"] == result["removed"] == 0
+    assert result["unchanged"] == len(DatasetXMLHelper.active_paths(os.path.join(DatasetXMLHelper.repository_path, xml)))
+
+
+def test_xml_sizes(storage, tmp_path):
+    pytest.importorskip("uproot")
+    xml = str(tmp_path / "Sample.xml")
+    DatasetXMLHelper.write_xml(xml, [ntuple_path(i) for i in range(1, 5)])
+    local_paths = [storage.add_file(ntuple_path(i), 100*i) for i in range(1, 4)]
+    expected = sum(os.path.getsize(local) for local in local_paths)
+
+    cache = DatasetXMLHelper.FileInfoCache(str(tmp_path / "cache.json"))
+    report = DatasetXMLHelper.xml_sizes([xml], cache, workers=2, branches=["weight"])
+    assert {key: report[xml][key] for key in ["files", "missing", "bytes"]} == {"files": 4, "missing": 1, "bytes": expected}
+    assert 0 < report[xml]["read_bytes"] < expected
+    # The sizes are taken from the cache once known
+    size = os.path.getsize(local_paths[0])
+    os.unlink(local_paths[0])
+    assert DatasetXMLHelper.file_sizes([ntuple_path(1)], cache) == {ntuple_path(1): size}
+    assert DatasetXMLHelper.file_sizes([ntuple_path(1)], cache, refresh=True) == {ntuple_path(1): None}